@@ -46,7 +46,8 @@ More detailed examples with explanations are provided in the
 sub-module and class.
 """
 from .utils import Dataset, Datasets
-from .model import Model, Models
+from .model import Model, Models, BasisWidths
 from .production import BreitWigner, Production
 from .efficiency import Efficiency
 from .limit import Limit, Limits
+from .scan import Scan
@@ -33,6 +33,10 @@ class Efficiency:
         tau_max, while below the minimum by t0 = tau_min and t1 =
         infinity.
 
+        If t0 = 0 and t1 = infinity, the efficiency ratio is always
+        one, and the member 'constant' is set as true. Otherwise it is
+        false.
+
         t0:     value or function for the lower proper lifetime (seconds).
         t1:     value or function for the upper proper lifetime (seconds).
         lratio: ratio between the decay and shielding volume for a beam-dump
@@ -42,6 +46,7 @@ class Efficiency:
         """
         # Return if efficiency for a r-value limit.
         self.__rvals = rvals
+        self.constant = False
         if self.__rvals: return
 
         # Initialize the cached results.
@@ -58,6 +63,7 @@ class Efficiency:
         if lratio == None:
             try: t1 = float(t1); self.__t1 = lambda m: t1
             except: self.__t1 = t1
+            self.constant = t0 == 0 and t1 == float("inf")
 
     ###########################################################################
     def __ts(self, m, limit):
@@ -0,0 +1,237 @@
+# DARKCAST is licensed under the GNU GPL version 2 or later.
+# Copyright (C) 2023 DARKCAST authors (see AUTHORS.md).
+
+# This example times some of the internal DarkCast utilities on the
+# data grids distributed with DarkCast. Each benchmark compares the
+# current implementation against the method it replaced, and checks
+# that both give the same result. The batched benchmarks require
+# NumPy. The widths of the models with axial couplings are also
+# checked to not depend on the order in which they are cached, and the
+# cached widths are checked to be recalculated after each way of
+# changing the parameters.
+
+# Update the system path to find the DarkCast module.
+# This assumes that 'examples' is in 'darkcast/examples.'
+import sys, os, inspect, random, timeit, copy, warnings
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(
+                inspect.getfile(inspect.currentframe()))), "../../"))
+
+# Import the DarkCast module.
+import darkcast
+numpy = darkcast.utils.numpy
+
+# Number of random points and repetitions to time.
+npoints, nreps = 2000, 5
+
+###############################################################################
+def timer(f):
+    """
+    Return the best time per point (microseconds) for a function.
+
+    f: function to time, which evaluates all the points.
+    """
+    return min(timeit.repeat(f, number = 1, repeat = nreps))/npoints*1e6
+
+###############################################################################
+def points(dataset):
+    """
+    Return random points within the range of a dataset, with some
+    points outside the range and some exactly on the grid.
+
+    dataset: dataset to generate the points for.
+    """
+    pts = []
+    for i in range(npoints):
+        pt = []
+        for axis in dataset.axes:
+            r = random.random()
+            if r < 0.1: pt.append(float(axis[random.randrange(len(axis))]))
+            elif r < 0.15: pt.append(float(axis[0]) - 1)
+            elif r < 0.2: pt.append(float(axis[-1]) + 1)
+            else: pt.append(random.uniform(float(axis[0]), float(axis[-1])))
+        pts.append(pt)
+    return pts
+
+###############################################################################
+def regula(axes, xs):
+    """
+    Return the bracketing structured keys of a point using the
+    modified regula falsi method previously used by 'Dataset'.
+
+    axes: list of sorted axes.
+    xs:   point to bracket.
+    """
+    k0s, k1s = [], []
+    for x, axis in zip(xs, axes):
+        k, k0, k1 = 0, 0, len(axis) - 1
+        if x <= axis[k0]:   k1 = k0
+        elif x >= axis[k1]: k0 = k1
+        else:
+            while k1 - k0 > 1:
+                k = k0 + int(
+                    round((x - axis[k0])*(k1 - k0)/(axis[k1] - axis[k0])))
+                if x == axis[k]: k0, k1 = k, k; break
+                if k == k0 or k == k1: k = k0 + int((k1 - k0)/2)
+                if x > axis[k]: k0 = k
+                else: k1 = k
+        k0s.append(k0)
+        k1s.append(k1)
+    return k0s, k1s
+
+###############################################################################
+# Benchmark the key finding for the R_mu^f grids and 2D r-value
+# limits. The 'spacing' column uses constant time key finding for
+# uniformly and log-uniformly spaced axes, and otherwise bisection.
+random.seed(0)
+datasets = [("rf.%s.%s" % (rf, "_".join(mesons)), dataset)
+            for rf, rfs in darkcast.pars.rfs.items()
+            for mesons, dataset in rfs.items()]
+datasets += [(name, darkcast.Dataset("limits/%s.lmt" % name)) for name in [
+    "LHCb_Aaij2017rft_displaced", "LHCb_Aaij2019bvg_displaced",
+    "AMMmu_Bodas2021fsy"]]
+print("%-35s %6s %10s %10s %10s %10s" % (
+    "key finding [us/point]", "size", "regula", "bisect", "spacing",
+    "batched"))
+for name, dataset in datasets:
+    pts = points(dataset)
+    axes = [[float(x) for x in axis] for axis in dataset.axes]
+    bisect = copy.copy(dataset)
+    bisect._Dataset__spaces = None
+
+    # Check the brackets are consistent.
+    for pt in pts:
+        k0s, k1s = dataset.bracket(pt)
+        r0s, r1s = regula(axes, pt)
+        for x, axis, k0, k1, r0, r1 in zip(pt, axes, k0s, k1s, r0s, r1s):
+            if not (axis[k0] <= x <= axis[k1] or x < axis[0] or x > axis[-1]
+                    ) or (r0 == r1 and (k0, k1) != (r0, r1)): raise Exception(
+                "Inconsistent bracket for %s at %r." % (name, pt))
+
+    # Time the methods.
+    told = timer(lambda: [regula(axes, pt) for pt in pts])
+    tbis = timer(lambda: [bisect.bracket(pt) for pt in pts])
+    tnew = timer(lambda: [dataset.bracket(pt) for pt in pts])
+    if numpy:
+        arr = numpy.array(pts) if dataset.dim() > 1 else numpy.array(
+            [pt[0] for pt in pts])
+        tvec = "%10.3f" % timer(lambda: dataset.bracket(arr))
+    else: tvec = "%10s" % "-"
+    print("%-35s %6i %10.3f %10.3f %10.3f %s" % (
+        name, len(dataset), told, tbis, tnew, tvec))
+
+###############################################################################
+# Count the function evaluations needed to recast each limit to the
+# B boson model when solving with Ridders' method, first finding each
+# bracket from the previous coupling and then from brackets predicted
+# from the previous couplings, and with Brent's method in log(g). The
+# 'difference' column is the maximum relative difference between the
+# recast couplings.
+model = darkcast.Model("B_boson")
+print("\n%-35s %10s %10s %10s %10s" % (
+    "solver [evaluations]", "discover", "predict", "brent", "difference"))
+totals = [0, 0, 0]
+for name, limit in darkcast.Limits().items():
+    stats = [darkcast.utils.SolveStats() for i in range(0, 3)]
+    recasts = [limit.recast(model, method = method, stats = stat,
+                            predict = predict) for method, predict, stat in
+               zip(["ridders", "ridders", "brent"], [False, True, True],
+                   stats)]
+    if recasts[0] == None: continue
+    diff = max([0] + [abs(g1/g0 - 1) for recast in recasts[1:]
+                      for key in recasts[0] for g0, g1 in zip(
+                              recasts[0][key].vals, recast[key].vals) if g0])
+    totals = [total + stat.evals for total, stat in zip(totals, stats)]
+    print("%-35s %10i %10i %10i %10.1e" % tuple(
+        [name] + [stat.evals for stat in stats] + [diff]))
+print("%-35s %10i %10i %10i" % tuple(["total"] + totals))
+
+###############################################################################
+# Time the total width of each model on a grid of masses, calculated
+# with the model and from the basis widths, and the total width of
+# randomly scaled couplings of each model from the basis widths. The
+# 'difference' column is the maximum relative difference between the
+# two total widths.
+if numpy:
+    masses = numpy.logspace(-3, 1, npoints)
+    basis = darkcast.BasisWidths(masses)
+    scales = numpy.random.uniform(0.5, 1.5, (100, 1, 12, 2))
+    print("\n%-35s %10s %10s %10s %10s" % (
+        "total width [us/point]", "model", "basis", "scan", "difference"))
+    for name, model in darkcast.Models().items():
+        if model.width("dark", 1.0) != 0: continue
+        couplings = model.couplings(masses)
+        cache = darkcast.Model(name, cache = 0)
+        tmod = timer(lambda: cache.width("total", masses))
+        tbas = timer(lambda: basis.width("total", couplings))
+        tscn = timer(lambda: basis.width("total", couplings*scales))/len(
+            scales)
+        widths = model.width("total", masses)
+        diff = max(abs(basis.width("total", couplings) - widths)/numpy.where(
+            widths > 0, widths, 1))
+        print("%-35s %10.3f %10.3f %10.3f %10.1e" % (
+            name, tmod, tbas, tscn, diff))
+
+###############################################################################
+# Check the widths of the models with axial couplings do not depend on
+# whether the hadronic width, which evaluates the exclusive hadronic
+# states without their axial checks, was calculated first.
+masses = [0.3 + 0.2*i for i in range(0, 10)]
+states = list(darkcast.pars.rfs) + ["hadrons", "visible", "total"]
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    for name, model in darkcast.Models().items():
+        if not model.xav[0]: continue
+        for m in masses:
+            fresh, cached = darkcast.Model(name), darkcast.Model(name)
+            widths = [fresh.width(state, m) for state in states]
+            for state, width in zip(states, widths):
+                cached.width("hadrons", m)
+                if cached.width(state, m) != width: raise Exception(
+                        "Width of '%s' for %s at %r depends on the cache "
+                        "order." % (state, name, m))
+print("\ncached widths of the axial models are independent of order")
+
+###############################################################################
+# Check the cached widths are recalculated after each way of changing
+# the parameters, including the nested R_mu^f grids. Each change is
+# made with the counted method under test, and any other steps needed
+# use the uncounted 'dict' methods.
+pars, model = darkcast.pars, darkcast.Model("dark_photon")
+mfs = dict(pars.mfs)
+rfs = dict((rf, dict(grids)) for rf, grids in pars.rfs.items())
+grid = pars.rfs["pi+_pi-"][("rho0",)]*2
+def popitem():
+    dict.pop(pars.mfs, "e")
+    dict.__setitem__(pars.mfs, "e", 0.2)
+    pars.mfs.popitem()
+    dict.__setitem__(pars.mfs, "e", 0.2)
+def nested():
+    pars.rfs = rfs
+    pars.rfs["pi+_pi-"][("rho0",)] = grid
+changes = [
+    ("setitem", "e_e", lambda: pars.mfs.__setitem__("e", 0.2)),
+    ("delitem", "e_e", lambda: (pars.mfs.__delitem__("e"),
+                                dict.__setitem__(pars.mfs, "e", 0.2))),
+    ("update", "e_e", lambda: pars.mfs.update(e = 0.2)),
+    ("setdefault", "e_e", lambda: (dict.pop(pars.mfs, "e"),
+                                   pars.mfs.setdefault("e", 0.2))),
+    ("pop", "e_e", lambda: (pars.mfs.pop("e"),
+                            dict.__setitem__(pars.mfs, "e", 0.2))),
+    ("popitem", "e_e", popitem),
+    ("clear", "e_e", lambda: (pars.mfs.clear(),
+                              dict.update(pars.mfs, mfs, e = 0.2))),
+    ("setattr", "e_e", lambda: setattr(pars, "mfs", dict(mfs, e = 0.2))),
+    ("nested setitem", "pi+_pi-",
+     lambda: pars.rfs["pi+_pi-"].__setitem__(("rho0",), grid)),
+    ("nested setattr", "pi+_pi-", nested)]
+if hasattr(dict, "__ior__"): changes += [
+        ("ior", "e_e", lambda: pars.mfs.__ior__({"e": 0.2}))]
+for name, state, change in changes:
+    width = model.width(state, 0.5)
+    change()
+    if model.width(state, 0.5) == width: raise Exception(
+            "Width of '%s' is not recalculated after %s." % (state, name))
+    pars.mfs, pars.rfs = mfs, rfs
+    if model.width(state, 0.5) != width: raise Exception(
+            "Width of '%s' is not restored after %s." % (state, name))
+print("cached widths are recalculated after each change of the parameters")
@@ -97,8 +97,12 @@ channels = collections.OrderedDict([
         #("total",                 "total"),
         ])
 
-# Create the list of masses for which to calculate the branching fractions.
+# Create the list of masses for which to calculate the branching
+# fractions. If NumPy is available, an array of masses is used, so
+# that the branching fractions for all the masses are calculated
+# together.
 masses = [mass*1e-2 for mass in range(1, 200)]
+if darkcast.utils.numpy: masses = darkcast.utils.numpy.array(masses)
 
 # Try to load matplotlib.
 try: import matplotlib.pyplot as pyplot
@@ -117,13 +121,17 @@ for name, model in models.items():
     for label, channel in channels.items():
         
         # Calculate the branching fraction for the model and channel
-        # as a function of mass.
-        bfracs = [model.bfrac(channel, mass) for mass in masses]
+        # as a function of mass. This is equivalent to calculating
+        # the branching fraction for each mass in turn:
+        #
+        # bfracs = [model.bfrac(channel, mass) for mass in masses]
+        bfracs = (model.bfrac(channel, masses) if darkcast.utils.numpy else
+                  [model.bfrac(channel, mass) for mass in masses])
 
         # Additionally, the width can be calculated using the 'width'
         # method and the same channels as for 'bfrac'.
         #
-        # widths = [model.width(channel, mass, g = 1) for mass in masses]
+        # widths = model.width(channel, masses, g = 1)
 
         # Save the branching fraction to a text file.
         txt = open("bfrac_%s_%s.txt" % (name, label.replace("$", "")), "w")
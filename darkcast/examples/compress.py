@@ -0,0 +1,97 @@
+# DARKCAST is licensed under the GNU GPL version 2 or later.
+# Copyright (C) 2023 DARKCAST authors (see AUTHORS.md).
+
+# This example compresses the data grids and limits distributed with
+# DarkCast, removing points which are reproduced within a relative
+# tolerance by linear interpolation of the neighboring points. The
+# compressed files are written to 'compress/data' and
+# 'compress/limits', and the reduction in points and the maximum
+# relative error for each file are printed. The tolerance can be
+# passed as the first argument, e.g. 'python compress.py 1e-3'. As
+# data files are first searched for in the current directory, running
+# DarkCast from the 'compress' directory, or setting
+# DARKCAST_DATA_PATH to it, uses the compressed files. The files are
+# written with full precision, so the printed errors are those of the
+# files.
+
+# Update the system path to find the DarkCast module.
+# This assumes that 'examples' is in 'darkcast/examples.'
+import sys, os, inspect, glob
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(
+                inspect.getfile(inspect.currentframe()))), "../../"))
+
+# Import the DarkCast module.
+import darkcast
+
+# The relative tolerance.
+rtol = float(sys.argv[1]) if len(sys.argv) > 1 else 1e-3
+
+# The format of the written values, which reproduces each value.
+fmt = "%.16e"
+
+###############################################################################
+def error(old, new):
+    """
+    Return the maximum relative error of a compressed dataset,
+    evaluated at the points of the original dataset.
+
+    old: original dataset.
+    new: compressed dataset.
+    """
+    err = 0
+    for xs, axis, vals in old.rows():
+        for x, val in zip(axis, vals):
+            dval = abs(new(xs + [float(x)]) - val)
+            if dval: err = max(err, dval/abs(val) if val else float("inf"))
+    return err
+
+# Loop over the data and limit files.
+print("%-40s %8s %8s %10s %10s" % (
+    "file", "points", "kept", "reduction", "error"))
+total, kept = 0, 0
+for sub, ext in [("data", ".dat"), ("limits", ".lmt")]:
+    if not os.path.exists("compress/" + sub): os.makedirs("compress/" + sub)
+    for path in sorted(glob.glob(os.path.join(
+            os.path.dirname(darkcast.__file__), sub, "*" + ext))):
+        name = os.path.join("compress", sub, os.path.basename(path))
+
+        # Read the file as datasets of the first column, unless it is a
+        # complete regular grid of dimension two or more, e.g. r-values,
+        # or the columns are not labeled.
+        with open(path) as txt:
+            lines = [line for line in txt if line.split("#")[0].split()]
+        dataset, datasets = darkcast.Dataset(path), None
+        if dataset.dim() == 1 or len(dataset) != len(lines):
+            try: datasets = darkcast.Datasets(path)
+            except darkcast.utils.DatasetsError: pass
+
+        # Single dataset.
+        if datasets == None:
+            compressed = dataset.compress(rtol)
+            err = error(dataset, compressed)
+            npoints, nkept = len(dataset), len(compressed)
+            with open(path) as txt: header = txt.readline()
+            with open(name, "w") as txt:
+                if header.startswith("#"): txt.write(header)
+                for xs, axis, vals in compressed.rows():
+                    for x, val in zip(axis, vals):
+                        txt.write(" ".join(fmt % v for v in xs + [
+                            x, val]) + "\n")
+
+        # Datasets of the first column.
+        else:
+            datasets = darkcast.Datasets(path)
+            compressed = datasets.compress(rtol)
+            err = max(error(datasets[key], compressed[key])
+                      for key in datasets)
+            npoints = len(datasets)*len(datasets[list(datasets)[0]])
+            nkept = len(datasets)*len(compressed[list(compressed)[0]])
+            with open(path) as txt:
+                xlabel = txt.readline().replace("#", "").split()[0]
+            compressed.write(name, xlabel, fmt)
+        total, kept = total + npoints, kept + nkept
+        print("%-40s %8i %8i %9.1f%% %10.2e" % (
+            os.path.join(sub, os.path.basename(path)), npoints, nkept,
+            100.0*(npoints - nkept)/npoints, err))
+print("%-40s %8i %8i %9.1f%%" % (
+    "total", total, kept, 100.0*(total - kept)/total))
@@ -1,6 +1,6 @@
 # DARKCAST is licensed under the GNU GPL version 2 or later.
 # Copyright (C) 2023 DARKCAST authors (see AUTHORS.md).
-import os, sys, inspect, collections, warnings
+import os, sys, inspect, collections, warnings, math
 from . import utils
 
 ###############################################################################
@@ -116,16 +116,51 @@ class Limit:
         except: self.valid = [True, True]
 
     ###########################################################################
-    def recast(self, model, gmax = 1e5):
+    def __predict(self, points, m, width = 0.02):
+        """
+        Return a bracket for the coupling at a mass, extrapolated
+        linearly in log-log from the last two solved couplings. If
+        three couplings are available, the bracket is widened by the
+        difference from the quadratic extrapolation. If fewer than two
+        couplings are available, (None, None) is returned.
+
+        points: list of the previous (mass, coupling) solutions.
+        m:      mass to extrapolate to.
+        width:  minimum relative half-width of the bracket.
+        """
+        if len(points) < 2: return None, None
+        pts = [(math.log(x), math.log(y)) for x, y in points[-3:]]
+        (x0, y0), (x1, y1), (x2, y2) = [pts[0]]*(3 - len(pts)) + pts
+        x = math.log(m)
+        y = y2 + (y2 - y1)*(x - x2)/(x2 - x1)
+        dy = math.log(1 + width)
+        if len(pts) > 2: dy = min(math.log(2.0), max(dy, 2*abs(
+            y0*(x - x1)*(x - x2)/((x0 - x1)*(x0 - x2))
+            + y1*(x - x0)*(x - x2)/((x1 - x0)*(x1 - x2))
+            + y2*(x - x0)*(x - x1)/((x2 - x0)*(x2 - x1)) - y)))
+        return math.exp(y - dy), math.exp(y + dy)
+
+    ###########################################################################
+    def recast(self, model, gmax = 1e5, method = "ridders", stats = None,
+               predict = True):
         """
         Recast these limits to a given model. Returns a dictionary
         with entries of 'lower' and when relevant, 'upper'. Each entry
         is of the form: [[m0, m1, ...], [g0, g1, ...]].
 
-        model: model for recasting, must be of type 'Model', e.g. 
-               Model('dark_photon').
-        gmax:  maximum coupling to recast. If a coupling is greater than 
-               or equal to this, then that mass point is skipped.
+        model:   model for recasting, must be of type 'Model', e.g. 
+                 Model('dark_photon').
+        gmax:    maximum coupling to recast. If a coupling is greater than 
+                 or equal to this, then that mass point is skipped.
+        method:  method used to solve for the couplings of lower/upper
+                 bounds, see 'utils.solve'. The couplings of r-value
+                 bounds are always solved together with Ridders' method,
+                 see 'utils.solve_many'.
+        stats:   optional 'utils.SolveStats' to add the solver counts to.
+        predict: if true, the couplings of lower/upper bounds are first
+                 solved within a bracket extrapolated from the previous
+                 masses, see '__predict'. If this fails, or if false, the
+                 bracket is found from the previous coupling.
         """
         # Return if the recasting cannot be performed.
         for i, c in [(0, "axial"), (1, "vector")]:
@@ -136,62 +171,117 @@ class Limit:
         
         # Initialize the recast bounds.
         rvals = self.bounds.get("rvals")
-        lower = utils.Dataset()
-        upper = utils.Dataset() if rvals or "upper" in self.bounds else None
+        lower = []
+        upper = [] if rvals or "upper" in self.bounds else None
 
         # Recast r-value bounds.
         if rvals: 
 
-            # Loop over the r-values.
-            jdx, tl, tu, gl, gu, rl, ru,  = 0, 0, 0, gmax, -gmax, 1, 1
-            tmin, tmax = float("inf"), 0
-            for idx, r1 in enumerate(rvals.vals):
+            # Loop over the masses.
+            tl, tu, lanes = 0, 0, []
+            for (m,), g1s, r1s in rvals.rows():
+                gl, gu, rl, ru = gmax, -gmax, 1, 1
+                tmin, tmax = float("inf"), 0
+
+                # Loop over the r-values for the mass.
+                for g1, r1 in zip(g1s, r1s):
 
-                # Determine the r-value via equation 2.21.
-                m, g1 = rvals._Dataset__f2x(idx)
-                tau = self.model.tau(m, g1)
-                g0 = model.g(m, tau)
-                b0 = model.bfrac(self.decay, m)
-                b1 = self.model.bfrac(self.decay, m)
-                pr = self.production.ratio(m, g0, g1, model, self.model)
-                r0 = r1*b1/(b0*pr) if b0*pr != 0 else gmax
+                    # Determine the r-value via equation 2.21.
+                    g1, r1 = float(g1), float(r1)
+                    tau = self.model.tau(m, g1)
+                    g0 = model.g(m, tau)
+                    b0 = model.bfrac(self.decay, m)
+                    b1 = self.model.bfrac(self.decay, m)
+                    pr = self.production.ratio(m, g0, g1, model, self.model)
+                    r0 = r1*b1/(b0*pr) if b0*pr != 0 else gmax
 
-                # Update the lower/upper limits.
-                if r0 < 1:
-                    if g0 < gl: tl, gl, rl = tau, g0, r0
-                    if g0 > gu: tu, gu, ru = tau, g0, r0
-                tmin = min(tmin, tau)
-                tmax = max(tmax, tau)
-                
-                # Check if final g for given m.
-                jdx += 1
-                if jdx == len(rvals.axes[1]):
+                    # Update the lower/upper limits.
+                    if r0 < 1:
+                        if g0 < gl: tl, gl, rl = tau, g0, r0
+                        if g0 > gu: tu, gu, ru = tau, g0, r0
+                    tmin = min(tmin, tau)
+                    tmax = max(tmax, tau)
 
-                    # Solve for any limits outside bounds.
-                    if tl == tmax and rl < 1:
-                        f = lambda g: g**2/gl**2*self.efficiency.ratio(
-                            m, self, model.tau(m, g), tl)/rl - 1
-                        try: gl = utils.solve(f, x1 = gl)
-                        except: pass
-                    if tu == tmin and ru < 1:
-                        f = lambda g: g**2/gu**2*self.efficiency.ratio(
-                            m, self, model.tau(m, g), tu)/ru - 1
-                        try: gu = utils.solve(f, x0 = gu)
-                        except: pass
+                # Queue any limits outside bounds to solve.
+                if tl == tmax and rl < 1:
+                    lanes.append((len(lower), lower, m, gl, tl, rl))
+                if tu == tmin and ru < 1:
+                    lanes.append((len(upper), upper, m, gu, tu, ru))
 
-                    # Update the bounds.
-                    lower.axes[0].append(m); lower.vals.append(abs(gl))
-                    upper.axes[0].append(m); upper.vals.append(abs(gu))
-                    jdx, gl, gu, rl, ru = 0, gmax, -gmax, 1, 1
-                    tmin, tmax = float("inf"), 0
+                # Update the bounds.
+                lower.append((m, gl))
+                upper.append((m, gu))
+
+            # Solve for all the limits outside bounds at once, where
+            # the lower limits are bracketed from above and the upper
+            # limits from below.
+            fails = set()
+            def f(gs, idxs):
+                vals = []
+                for g, idx in zip(gs, idxs):
+                    k, bounds, m, gb, tb, rb = lanes[idx]
+                    g = float(g)
+                    try: vals.append(g**2/gb**2*self.efficiency.ratio(
+                        m, self, model.tau(m, g), tb)/rb - 1)
+                    except: fails.add(idx); vals.append(float("nan"))
+                return vals
+            nan = float("nan")
+            gs, errs = utils.solve_many(
+                f, [gb if bounds is upper else nan
+                    for k, bounds, m, gb, tb, rb in lanes],
+                [gb if bounds is lower else nan
+                 for k, bounds, m, gb, tb, rb in lanes], stats = stats)
+            for idx, (k, bounds, m, gb, tb, rb) in enumerate(lanes):
+                if errs[idx] == None and idx not in fails:
+                    bounds[k] = (m, float(gs[idx]))
+            lower[:] = [(m, abs(g)) for m, g in lower]
+            upper[:] = [(m, abs(g)) for m, g in upper]
             
+        # Recast lifetime independent lower bounds. With a constant
+        # efficiency ratio and a production which depends upon the
+        # square of the global coupling, equation 2.2 is solved by
+        # g0 = g1/sqrt(B0/B1*P0/P1) for all the masses at once. The
+        # branching fractions are evaluated for all the masses
+        # together. The production ratio is evaluated for each mass,
+        # as the cross-sections, which can be user supplied, are
+        # functions of a single mass.
+        elif (upper == None and self.efficiency.constant and
+              self.production.fast):
+            ms = [float(m) for m in self.bounds["lower"].axes[0]]
+            g1s = [float(g) for g in self.bounds["lower"].vals]
+            if utils.numpy:
+                numpy = utils.numpy
+                ms, g1s = numpy.array(ms), numpy.array(g1s)
+                b0s = model.bfrac(self.decay, ms)
+                b1s = self.model.bfrac(self.decay, ms)
+                keep = (b0s != 0) & (b1s != 0)
+                prs = numpy.zeros(ms.shape)
+                prs[keep] = [self.production.ratio(m, 1, 1, model, self.model)
+                             for m in ms[keep].tolist()]
+                keep &= prs != 0
+                ms, g1s, rs = ms[keep], g1s[keep], (
+                    b0s[keep]/b1s[keep]*prs[keep])
+                g0s = numpy.where(g1s >= gmax, gmax, g1s/numpy.sqrt(rs))
+                lower = list(zip(ms.tolist(), g0s.tolist()))
+            else:
+                for m, g1 in zip(ms, g1s):
+                    b0 = model.bfrac(self.decay, m)
+                    if b0 == 0: continue
+                    b1 = self.model.bfrac(self.decay, m)
+                    if b1 == 0: continue
+                    pr = self.production.ratio(m, 1, 1, model, self.model)
+                    if pr == 0: continue
+                    lower.append((m, gmax if g1 >= gmax else
+                                  g1/math.sqrt(b0/b1*pr)))
+
         # Recast lower/upper bounds.
         else:
 
             # Loop over the masses.
-            g0l = None
+            g0l, gls, gus = None, [], []
             for m, g1l in zip(self.bounds["lower"].axes[0],
                               self.bounds["lower"].vals):
+                m, g1l = float(m), float(g1l)
 
                 # Check if branching fraction and production is non-zero.
                 if model.bfrac(self.decay, m) == 0: continue
@@ -201,8 +291,8 @@ class Limit:
     
                 # Check if limit is above maximum and set guess.
                 if g1l >= gmax: 
-                    lower.axes[0].append(m); lower.vals.append(gmax)
-                    if upper: upper.axes[0].append(m); upper.vals.append(gmax)
+                    lower.append((m, gmax))
+                    if upper != None: upper.append((m, gmax))
                     continue
                 ggl = g0l if g0l != None else g1l
     
@@ -212,28 +302,55 @@ class Limit:
                     * self.production.ratio(m, g, g1l, model, self.model) 
                     * self.efficiency.ratio(m, self, model.tau(m, g), 
                                             self.model.tau(m, g1l)) - 1)
-                try: g0l = utils.solve(f, x = ggl)
-                except: g0l = gmax
+                g0l, (g0, g1) = None, self.__predict(gls, m)
+                if predict and g0 != None:
+                    try: g0l = utils.solve(f, g0, g1, method = method,
+                                           stats = stats)
+                    except: pass
+                if g0l == None:
+                    try: g0l = utils.solve(
+                            f, x = ggl, method = method, stats = stats)
+                    except: g0l = gmax
     
                 # If upper bound, find second zero, e.g. equations C.5 - C.7.
                 if upper == None:
-                    lower.axes[0].append(m); lower.vals.append(g0l)
+                    lower.append((m, g0l))
+                    if 0 < g0l < gmax: gls.append((m, g0l))
                 else:
+                    g0u = None
                     if g0l == gmax: g0u = gmax
                     elif f(g0l*1.01) < 0:
-                        try: g0u = utils.solve(f, x1 = g0l*0.99)
-                        except: g0u = gmax
+                        g0, g1 = self.__predict(gls, m)
+                        if predict and g0 != None and g1 < g0l*0.99:
+                            try: g0u = utils.solve(f, g0, g1, method = method,
+                                                   stats = stats)
+                            except: pass
+                        if g0u == None:
+                            try: g0u = utils.solve(f, x1 = g0l*0.99, method
+                                                   = method, stats = stats)
+                            except: g0u = gmax
                     else:
-                        try: g0u = utils.solve(f, x0 = g0l*1.01)
-                        except: g0u = gmax
+                        g0, g1 = self.__predict(gus, m)
+                        if predict and g0 != None and g0 > g0l*1.01:
+                            try: g0u = utils.solve(f, g0, g1, method = method,
+                                                   stats = stats)
+                            except: pass
+                        if g0u == None:
+                            try: g0u = utils.solve(f, x0 = g0l*1.01, method
+                                                   = method, stats = stats)
+                            except: g0u = gmax
                     if g0u < g0l: g0u, g0l = g0l, g0u
-                    lower.axes[0].append(m); lower.vals.append(g0l)
-                    upper.axes[0].append(m); upper.vals.append(g0u)
+                    lower.append((m, g0l))
+                    upper.append((m, g0u))
+                    if 0 < g0l < gmax: gls.append((m, g0l))
+                    if 0 < g0u < gmax: gus.append((m, g0u))
 
         # Return the recast bounds.
         bounds = utils.Datasets()
-        bounds["lower"] = lower
-        if upper != None: bounds["upper"] = upper
+        bounds["lower"] = utils.Dataset(
+            axes = [[m for m, g in lower]], vals = [g for m, g in lower])
+        if upper != None: bounds["upper"] = utils.Dataset(
+            axes = [[m for m, g in upper]], vals = [g for m, g in upper])
         return bounds
 
 ###############################################################################
@@ -3,6 +3,9 @@
 import os, sys, inspect, math, collections, warnings
 from . import utils, pars
 
+# The NumPy array type, which masses may be passed as.
+ndarray = utils.numpy.ndarray if utils.numpy else ()
+
 ###############################################################################
 class ModelError(Exception):
     """
@@ -16,11 +19,34 @@ class Model:
     Provides the information and methods needed to define a given
     model, e.g. 'dark_photon'.
 
-    name: name of the model.
-    xav:  flags if the model contains non-zero [axial, vector] couplings.
-    xfs:  dictionary of fermion couplings (axial, vector). Each coupling is 
-          a function dependent upon mass (GeV).
-    q:    quark U(3) charge matrix.
+    name:       name of the model.
+    parameters: dictionary of the model parameters, for a model family,
+                otherwise empty.
+    states:     final states used when calculating the total width.
+    xav:        flags if the model contains non-zero [axial, vector]
+                couplings.
+    xfs:        dictionary of fermion couplings (axial, vector). Each
+                coupling is a function dependent upon mass (GeV),
+                which for a constant coupling returns its value in 'xcs'.
+    xcs:        constant fermion couplings (axial, vector), in the order
+                of 'pars.mfs', as an array of shape (12, 2) if the NumPy
+                module is available, otherwise a list of pairs. Couplings
+                which depend upon mass are NaN.
+    q:          quark U(3) charge matrix.
+    hits:       number of widths taken from the width cache.
+    misses:     number of widths calculated and added to the width cache.
+    tables:     compiled width tables, a 'Datasets' with the width of each
+                individual final state as a function of mass, or 'None'
+                if the model has not been compiled, see 'compile'.
+
+    The widths for each state and mass are kept in a least recently
+    used cache, which is cleared whenever the parameters of 'pars'
+    change, see 'pars.version'.
+
+    If the NumPy module is available, the masses passed to 'width',
+    'tau', 'g', and 'bfrac' can also be arrays, in which case an
+    array of the same shape is returned. The widths for the whole
+    array are then calculated together and are not cached.
 
     The final states for a model can be specified with the following string
     keys.
@@ -83,7 +109,8 @@ class Model:
     * 'total'
     """
     ###########################################################################
-    def __init__(self, name, states = None, dwidth = None, path = None):
+    def __init__(self, name, states = None, dwidth = None, path = None,
+                 cache = 65536, parameters = None):
         """
         Load a model, given its name.
 
@@ -98,6 +125,13 @@ class Model:
         'xfs', where each coupling can either be a constant, or a mass 
         dependent function.
 
+        Alternatively, for a family of models, 'xfs' can be a function
+        returning this dictionary, where the named parameters of the
+        family are the arguments of the function, each with a default
+        value, e.g. 'def xfs(the = 0.1, kap = 0.)'. The parameters are
+        available to the dark sector width as 'model.parameters', and
+        other members of the family can be created with 'vary'.
+
         The list 'states' may be defined, specifying the allowed final
         states for the model, e.g. ['e_e', 'mu_mu', 'invisible',
         ...]. Only these final states are used when calculating the
@@ -118,49 +152,121 @@ class Model:
                 see the documentation for this class for details.
         dwidth: optionally, specify the dark sector width as a function of 
                 a given mass and this model.
-        path:   optionally, specify the path to load the module from.
+        path:       optionally, specify the path to load the module from.
+        cache:      maximum number of widths to cache.
+        parameters: optionally, a dictionary of the parameters for a
+                    model family, where any parameters not given take
+                    their default values.
         """
-        # Set the name, axial/vector configuration, and cache.
-        self.name, self.xav = name, [False, False]
-        self.__cache = {}
-
         # Import the model.
         model = utils.envimport(name, [path] if path else (
             [""] + utils.envpaths("MODEL", "models")))
+        self.__load(name, model, states, dwidth, cache, parameters)
+
+    ###########################################################################
+    def __load(self, name, model, states, dwidth, cache, parameters):
+        """
+        Load a model from its imported module, see '__init__'.
 
-        # Load the model's fermion couplings (axial, vector).
-        self.xfs = {}
+        name:       name of the model.
+        model:      imported module of the model.
+        states:     allowed final states of the model, or 'None'.
+        dwidth:     dark sector width function, or 'None'.
+        cache:      maximum number of widths to cache.
+        parameters: parameters for a model family, or 'None'.
+        """
+        # Set the name, axial/vector configuration, and cache.
+        self.name, self.xav = name, [False, False]
+        self.__cache, self.__size = collections.OrderedDict(), cache
+        self.__version, self.hits, self.misses = pars.version, 0, 0
+        self.tables, self.__range = None, (0, 0)
+        self.__module, self.__options = model, (states, dwidth, cache)
+        self.__file = getattr(model, "__file__", None)
+
+        # Set the parameters of a model family.
+        self.parameters, xfs = {}, getattr(model, "xfs", None)
+        if callable(xfs):
+            try: self.parameters = collections.OrderedDict([
+                    (key, par.default) for key, par in inspect.signature(
+                        xfs).parameters.items()])
+            except: raise ModelError(
+                "Error loading the parameters from '%s'." % name)
+            if inspect.Parameter.empty in self.parameters.values():
+                raise ModelError(
+                    "Parameters from '%s' must have defaults." % name)
+            for key, val in (parameters or {}).items():
+                if key not in self.parameters: raise ModelError(
+                    "Unknown parameter '%s' for '%s'." % (key, name))
+                self.parameters[key] = val
+            try: xfs = xfs(**self.parameters)
+            except: raise ModelError(
+                "Error evaluating the couplings from '%s'." % name)
+        elif parameters: raise ModelError(
+                "The model '%s' is not a model family." % name)
+
+        # Load the model's fermion couplings (axial, vector). The
+        # values of constant couplings are also kept, otherwise 'None'.
+        self.xfs, self.__xcs = {}, {}
         for f in pars.mfs:
-            xf = [0., 0.]
+            xf, self.__xcs[f] = [0., 0.], [None, None]
             for i in [0, 1]:
                 try:
-                    float(model.xfs[f][i])
-                    xf[i] = lambda m, f = f, i = i: float(model.xfs[f][i])
-                    if float(model.xfs[f][i]) != 0: self.xav[i] = True
+                    xc = float(xfs[f][i])
+                    xf[i] = lambda m, xc = xc: xc
+                    self.__xcs[f][i] = xc
+                    if xc != 0: self.xav[i] = True
                 except: 
                     try:
-                        xf[i] = model.xfs[f][i]
+                        xf[i] = xfs[f][i]
                         self.xav[i] = True
                     except: raise ModelError(
                         "Error loading '%s' coupling from '%s'." % (f, name))
             self.xfs[f] = tuple(xf)
+            self.__xcs[f] = tuple(self.__xcs[f])
+        self.xcs = [[float("nan") if xc == None else xc for xc in
+                     self.__xcs[f]] for f in pars.mfs]
+        if utils.numpy: self.xcs = utils.numpy.array(self.xcs)
+
+        # The quark couplings of each type, if these are all constant.
+        self.__qcs = [None, None]
+        for i in [0, 1]:
+            qcs = tuple(self.__xcs[q][i] for q in ["u", "d", "s"])
+            if not None in qcs: self.__qcs[i] = qcs
 
         # Load the model's dark sector width function.
         try: self.__dwidth = dwidth if dwidth != None else model.dwidth
         except: self.__dwidth = lambda m, model: 0.0
-        self.__dwidth(0, self)
         
         # Create the quark U(3) charge matrix.
         self.q = [self.xfs["u"], self.xfs["d"], self.xfs["s"]]
 
-        # Load the model's defined final states.
-        try: self.__states = states if states != None else model.states
-        except: self.__states = ["visible", "invisible"]
-        self.width("total", 0)
+        # Load the model's defined final states and compile them.
+        try: self.states = states if states != None else model.states
+        except: self.states = ["visible", "invisible"]
+        try: self.__compile()
+        except: raise ModelError(
+            "Invalid definition of allowed final states from '%s'." % name)
+        self.__dwidth(0, self)
         try: self.width("total", 0)
         except: raise ModelError(
             "Invalid definition of allowed final states from '%s'." % name)
 
+    ###########################################################################
+    def vary(self, parameters):
+        """
+        Return a new model of the same family, with the given
+        parameters changed and all other parameters and options
+        unchanged. The module of the model is not imported again.
+
+        parameters: dictionary of the parameters to change.
+        """
+        if not self.parameters: raise ModelError(
+            "The model '%s' is not a model family." % self.name)
+        model = Model.__new__(Model)
+        model.__load(self.name, self.__module, *self.__options,
+                     parameters = dict(self.parameters, **parameters))
+        return model
+
     ###########################################################################
     def trq(self, m, s, t):
         """
@@ -172,11 +278,40 @@ class Model:
         t: diagonal of the matrix to perform the trace with, must be
            size 3.
         """
-        try: return (t[0]*self.xfs["u"][s](m) + t[1]*self.xfs["d"][s](m) +
-                     t[2]*self.xfs["s"][s](m))
+        try:
+            if isinstance(m, ndarray):
+                cs = [self.__vxf(m, s, q) for q in ["u", "d", "s"]]
+                return t[0]*cs[0] + t[1]*cs[1] + t[2]*cs[2]
+            qcs = self.__qcs[s]
+            if qcs != None: return t[0]*qcs[0] + t[1]*qcs[1] + t[2]*qcs[2]
+            return (t[0]*self.xfs["u"][s](m) + t[1]*self.xfs["d"][s](m) +
+                    t[2]*self.xfs["s"][s](m))
         except: raise ModelError(
             "Invalid diagonal provided to the trace.")
 
+    ###########################################################################
+    def couplings(self, m):
+        """
+        Return the (axial, vector) couplings of each fermion, in the
+        order of 'pars.mfs', as a list of pairs for a mass. For an
+        array of masses, an array with two additional trailing axes
+        is returned, e.g. with shape (N, 12, 2) for N masses, which can
+        be passed to 'BasisWidths'. The constant couplings are
+        broadcast from 'xcs', and only the couplings which depend
+        upon mass are evaluated.
+
+        m: mass (GeV), or array of masses.
+        """
+        if isinstance(m, ndarray):
+            numpy, ms = utils.numpy, m.ravel()
+            cs = numpy.empty((len(ms),) + self.xcs.shape)
+            cs[:] = self.xcs
+            for k, f in enumerate(pars.mfs):
+                for i, xc in enumerate(self.__xcs[f]):
+                    if xc == None: cs[:, k, i] = self.__vxf(ms, i, f)
+            return cs.reshape(m.shape + self.xcs.shape)
+        return [[xf(m) for xf in self.xfs[f]] for f in pars.mfs]
+
     ###########################################################################
     def width(self, states, m, g = 1.0):
         """
@@ -185,9 +320,34 @@ class Model:
 
         states: final state or states, see the documentation for this class 
                 for details.
-        m:      mass (GeV).
+        m:      mass (GeV), or array of masses.
         g:      global coupling (unitless).
         """
+        # Clear the cache and compiled tables if the parameters have
+        # changed.
+        if self.__version != pars.version:
+            self.__cache.clear()
+            self.__version = pars.version
+            self.__compile()
+            if self.tables != None:
+                self.tables = None
+                warnings.warn("Parameters have changed, the compiled width "
+                              "tables for '%s' are removed." % self.name)
+
+        # Calculate the widths for an array of masses, using the
+        # compiled tables if all the masses are within their range.
+        if isinstance(m, ndarray):
+            ms = m.ravel()
+            tables = self.tables if self.tables != None and len(ms) and (
+                self.__range[0] <= ms.min() and
+                ms.max() <= self.__range[1]) else None
+            part = self.__vwidth(states, ms, tables)
+            return None if part is None else g*g*part.reshape(m.shape)
+
+        # Use the compiled tables if the mass is within their range.
+        tables = self.tables if self.tables != None and (
+            self.__range[0] <= m <= self.__range[1]) else None
+
         # Loop over the states.
         total = 0
         for state in (states,) if isinstance(states, str) else states:
@@ -196,92 +356,464 @@ class Model:
             if state == "none": return None
 
             # Use cached result if valid.
-            cache = self.__cache.get(state)
-            if cache and cache[0] == m: total += cache[-1]; continue
-    
-            # Invisible, visible, dark sector, neutrino, lepton,
-            # quark, hadron, and total widths.
-            dtrs = state.split("_")
-            if state == "invisible":
-                part = self.width(["dark", "neutrinos"], m)
-            elif state == "visible":
-                part = self.width(
-                    ["leptons", "quarks", "hadrons"] +
-                    ([] if self.xav[0] else ["gamma_gamma_gamma"]), m)
+            key = (state, m)
+            part = self.__cache.get(key)
+            if part != None:
+                self.__cache.move_to_end(key)
+                self.hits += 1
+                total += part; continue
+
+            # Sum the widths of the individual final states, using the
+            # compiled tables if available. For aliases, the width of
+            # each individual final state is also cached.
+            leaves = self.__leaves.get(state)
+            if leaves == None: raise ModelError(
+                "Unknown state '%s'." % state)
+            part = 0
+            for leaf in leaves:
+                sub = None if leaf == state else self.__cache.get((leaf, m))
+                if sub == None:
+                    sub = tables[leaf](m) if tables != None and (
+                        leaf in tables) else self.__kernels[leaf](m)
+                    if leaf != state: self.__store((leaf, m), sub)
+                else: self.hits += 1
+                part += sub
+
+            # Cache the result.
+            total += part
+            self.__store(key, part)
+        return g*g*total
+
+    ###########################################################################
+    def __store(self, key, part):
+        """
+        Add a width to the cache, removing the least recently used
+        width if the cache is full.
+
+        key:  key of the width, the state and mass.
+        part: width to cache.
+        """
+        self.misses += 1
+        self.__cache[key] = part
+        if len(self.__cache) > self.__size: self.__cache.popitem(False)
+
+    ###########################################################################
+    def __compile(self):
+        """
+        Compile the final states of the model. A kernel is created for
+        the width of each individual final state, i.e. the fermion
+        pairs, the exclusive hadronic states, 'gamma_gamma_gamma',
+        'hadrons', and 'dark', with the needed constants, couplings,
+        and R_mu^f grids bound once. Each alias is then flattened into
+        its list of individual final states, so 'width' sums the
+        kernels in a single loop.
+        """
+        kernels, xfs, xcs = {}, self.xfs, self.__xcs
+
+        # Perturbative decay into a fermion pair, equation 2.13. The
+        # constant couplings are bound directly.
+        def pair(m, cf, mf, axf, vxf):
+            if m > 2.*mf: return (cf*vxf**2.*m/(12.*math.pi)*(
+                    1. + 2.*mf**2./m**2.)*math.sqrt(1. - 4.*mf**2./m**2.) +
+                                  cf*axf**2.*m/(12.*math.pi)*(
+                    1. - 4.*mf**2./m**2.)*math.sqrt(1. - 4.*mf**2./m**2.))
+            return 0
+        for f, mf in pars.mfs.items():
+            if None in xcs[f]: kernels["%s_%s" % (f, f)] = (
+                lambda m, cf = pars.cfs[f], mf = mf, xf = xfs[f]:
+                pair(m, cf, mf, xf[0](m), xf[1](m)))
+            else: kernels["%s_%s" % (f, f)] = (
+                lambda m, cf = pars.cfs[f], mf = mf, xc = xcs[f]:
+                pair(m, cf, mf, xc[0], xc[1]))
+
+        # Perturbative decay into three photons via an electron loop,
+        # equation 3.5 of Seo:2020dtx.
+        def photons(m, mf = pars.mfs["e"], xf = xfs["e"]):
+            if self.xav[0]:
+                warnings.warn("Cannot calculate width for state "
+                              "'gamma_gamma_gamma' with non-zero axial "
+                              "couplings.")
+                return 0
+            axf, vxf = xf[0](m), xf[1](m)
+            if m <= 2.*mf: return (
+                ((axf**2. + vxf**2)*pars.ge**6.)/(4.*math.pi)**4./(
+                2.**7.*3.**6.*5.**2.*math.pi**3.)*(m**9./mf**8.)*(
+                17./5. + (67.*m**2.)/(42.*mf**2.) +
+                (128941.*m**4.)/(246960.*mf**4.)))
+            return 0
+        kernels["gamma_gamma_gamma"] = photons
+
+        # Decay into hadrons, equations 2.17 and 2.18. The vector
+        # components of the hadronic width do not check the axial
+        # couplings. For constant quark couplings, the folded grid is
+        # used, see '__fold'.
+        folds, constant = {}, self.__qcs[1] != None
+        def exclusive(m, state, rfs, check = True):
+            part = 0
+            if check and self.xav[0]: warnings.warn(
+                    "Cannot calculate width for state '%s' with non-zero "
+                    "axial couplings." % state)
+            elif constant:
+                fold = folds.get(state)
+                if fold == None: fold = folds[state] = self.__fold(rfs)
+                part = m/(12*math.pi)*fold(m)
+            else:
+                for rvs, rf in rfs:
+                    sub = 1
+                    for rv, tm in rvs: sub *= rv*self.trq(m, 1, tm)
+                    sub *= sub if len(rvs) == 1 else 2
+                    sub *= rf(m)
+                    part += m/(12*math.pi)*sub
+            return part
+        hadrons = []
+        for state, rfs in pars.rfs.items():
+            rfs = [([(pars.rvs[meson], pars.tms[meson]) for meson in mesons],
+                    rf) for mesons, rf in rfs.items()]
+            hadrons += [(state, rfs)]
+            kernels[state] = (lambda m, state = state, rfs = rfs:
+                              exclusive(m, state, rfs))
+
+        # Hadronic width, with the axial component from equation 2.11
+        # of the axial paper. For constant quark couplings, the grids
+        # of all the exclusive states are folded together, and the
+        # axial component is skipped when the axial couplings are zero.
+        every = ("hadrons", [rf for state, rfs in hadrons for rf in rfs])
+        axial = self.__qcs[0] != (0, 0, 0)
+        def inclusive(m, sud = pars.sfs["u_d"], ss = pars.sfs["s"],
+                      mk = pars.mms["K"], xs = xfs["s"]):
+            part = 0
+            if constant: part += exclusive(m, every[0], every[1], False)
+            else:
+                for state, rfs in hadrons:
+                    part += exclusive(m, state, rfs, False)
+            if not axial: return part
+            ps, ud, s = 1. if m > 2*mk else 0., sud(m), ss(m)
+            part += m/(4.*math.pi)*(
+                self.trq(m, 0, [1, -1, 0])**2.*ud
+                + ps*xs[0](m)**2.*(
+                    ud/4. + s - pars.cphi*(ud*s)**0.5))
+            return part
+        kernels["hadrons"] = inclusive
+
+        # Dark sector width.
+        kernels["dark"] = lambda m: self.__dwidth(m, self)
+
+        # Flatten the aliases.
+        def flatten(state, depth = 0):
+            if state in kernels: return [state]
+            alias = self.__alias(state)
+            if alias == None or depth > 10: raise ModelError(
+                "Unknown state '%s'." % state)
+            return [leaf for sub in ((alias,) if isinstance(alias, str) else
+                                     alias) for leaf in flatten(sub, depth + 1)]
+        leaves = dict((state, [state]) for state in kernels)
+        for state in ["invisible", "visible", "neutrinos", "leptons",
+                      "quarks", "total"]: leaves[state] = flatten(state)
+        self.__kernels, self.__leaves = kernels, leaves
+
+    ###########################################################################
+    def __fold(self, rfs):
+        """
+        Return the R_mu^f grids of one or more exclusive hadronic
+        states, each multiplied by its factor from the constant vector
+        quark couplings and summed into a single grid. As the grids
+        are linearly interpolated, the folded grid on the union of
+        their masses reproduces the sum of the grids up to rounding.
+
+        rfs: list of the meson factors and grid for each contribution,
+             where the meson factors are (rvs, tms) pairs.
+        """
+        vxs = self.__qcs[1]
+        axis = sorted(set([float(m) for rvs, rf in rfs for m in rf.axes[0]]))
+        if utils.numpy: axis = utils.numpy.array(axis)
+        vals = 0 if utils.numpy else [0]*len(axis)
+        for rvs, rf in rfs:
+            sub = 1
+            for rv, tm in rvs: sub *= rv*(
+                    tm[0]*vxs[0] + tm[1]*vxs[1] + tm[2]*vxs[2])
+            sub *= sub if len(rvs) == 1 else 2
+            if utils.numpy: vals = vals + sub*rf(axis)
+            else: vals = [val + sub*rf(m) for val, m in zip(vals, axis)]
+        return utils.Dataset(axes = [axis], vals = vals)
+
+    ###########################################################################
+    def __alias(self, state):
+        """
+        Return the final states of an alias, or None if the state is
+        not an alias. The hadronic alias is handled separately.
+
+        state: final state.
+        """
+        if state == "invisible": return ["dark", "neutrinos"]
+        elif state == "visible": return (
+                ["leptons", "quarks", "hadrons"] +
+                ([] if self.xav[0] else ["gamma_gamma_gamma"]))
+        elif state == "neutrinos": return ["nue_nue", "numu_numu",
+                                           "nutau_nutau"]
+        elif state == "leptons": return ["e_e", "mu_mu", "tau_tau"]
+        elif state == "quarks": return ["c_c", "b_b", "t_t"]
+        elif state == "total": return self.states
+        return None
+
+    ###########################################################################
+    def __vxf(self, ms, s, f):
+        """
+        Return the coupling of a given type for a fermion, for an array
+        of masses, broadcasting the coupling if it is constant.
+
+        ms: array of masses (GeV).
+        s:  coupling type, either 0 for axial or 1 for vector.
+        f:  fermion, e.g. 'e'.
+        """
+        xc = self.__xcs[f][s]
+        if xc == None: return self.__vcall(self.xfs[f][s], ms)
+        return utils.numpy.full(ms.shape, xc)
+
+    ###########################################################################
+    def __vcall(self, f, ms, *args):
+        """
+        Return a mass dependent function, e.g. a coupling or the dark
+        sector width, evaluated for an array of masses. The function
+        is first called with the array, and if this fails or does not
+        return a value per mass, it is called for each mass in turn.
+
+        f:    function to evaluate.
+        ms:   array of masses (GeV).
+        args: additional arguments passed to the function.
+        """
+        numpy = utils.numpy
+        try:
+            vals = numpy.asarray(f(ms, *args), dtype = float)
+            if vals.shape == ms.shape: return vals
+            elif vals.ndim == 0: return numpy.full(ms.shape, float(vals))
+        except: pass
+        return numpy.array([f(float(m), *args) for m in ms], dtype = float)
+
+    ###########################################################################
+    def __vwidth(self, states, ms, tables = None):
+        """
+        Return the widths, in GeV, for the specified states and a flat
+        array of masses, with a global coupling of one. This mirrors
+        'width' operation by operation, so each element agrees with
+        the width for the corresponding scalar mass up to rounding.
+
+        states: final state or states.
+        ms:     flat array of masses (GeV).
+        tables: optionally, compiled width tables covering the masses.
+        """
+        numpy = utils.numpy
+        total = numpy.zeros(ms.shape)
+        for state in (states,) if isinstance(states, str) else states:
+
+            # Decoupled decay.
+            if state == "none": return None
+
+            # Compiled tables, aliases, and the dark sector width.
+            dtrs, alias = state.split("_"), self.__alias(state)
+            if tables != None and state in tables:
+                part = tables[state](ms)
+            elif alias != None:
+                part = self.__vwidth(alias, ms, tables)
             elif state == "dark":
-                part = self.__dwidth(m, self)
-            elif state == "neutrinos":
-                part = self.width(["nue_nue", "numu_numu", "nutau_nutau"], m)
-            elif state == "leptons":
-                part = self.width(["e_e", "mu_mu", "tau_tau"], m)
-            elif state == "quarks":
-                part = self.width(["c_c", "b_b", "t_t"], m)
-            elif state == "total":
-                part = self.width(self.__states, m)
+                part = self.__vcall(self.__dwidth, ms, self)
 
             # Hadronic width.
             elif state == "hadrons":
-                # Remove axial check for vector components.
                 axial, self.xav[0] = self.xav[0], False
-                part = self.width(pars.rfs.keys(), m)
+                part = self.__vwidth(pars.rfs.keys(), ms)
                 self.xav[0] = axial
-                # Axial component from equation 2.11 of axial paper.
-                ps = 1. if m > 2*pars.mms["K"] else 0.
-                part += m/(4.*math.pi)*(
-                self.trq(m, 0, [1, -1, 0])**2.*pars.sfs["u_d"](m)
-                    + ps*self.xfs["s"][0](m)**2.*(
-                    pars.sfs["u_d"](m)/4. + pars.sfs["s"](m)
-                    - pars.cphi*(pars.sfs["u_d"](m)*pars.sfs["s"](m))**0.5))
-    
-            # Perturbative decay into a fermion pair, equation 2.13.
+                ps = numpy.where(ms > 2*pars.mms["K"], 1., 0.)
+                sud, ss = pars.sfs["u_d"](ms), pars.sfs["s"](ms)
+                part = part + ms/(4.*math.pi)*(
+                    self.trq(ms, 0, [1, -1, 0])**2.*sud
+                    + ps*self.__vxf(ms, 0, "s")**2.*(
+                        sud/4. + ss - pars.cphi*(sud*ss)**0.5))
+
+            # Perturbative decay into a fermion pair. Masses below
+            # threshold are replaced to avoid invalid square roots.
             elif len(dtrs) == 2 and dtrs[0] == dtrs[1] and dtrs[0] in pars.mfs:
                 dtr = dtrs[0]
-                cf, mf   = pars.cfs[dtr], pars.mfs[dtr]
-                axf, vxf = self.xfs[dtr][0](m), self.xfs[dtr][1](m)
-                if m > 2.*mf: part = (cf*vxf**2.*m/(12.*math.pi)*(
-                        1. + 2.*mf**2./m**2.)*math.sqrt(1. - 4.*mf**2./m**2.) +
-                                      cf*axf**2.*m/(12.*math.pi)*(
-                        1. - 4.*mf**2./m**2.)*math.sqrt(1. - 4.*mf**2./m**2.))
-                else: part = 0
-
-            # Perturbative decay into three photons via an electron loop,
-            # equation 3.5 of Seo:2020dtx.
+                cf, mf = pars.cfs[dtr], pars.mfs[dtr]
+                axf = self.__vxf(ms, 0, dtr)
+                vxf = self.__vxf(ms, 1, dtr)
+                above = ms > 2.*mf
+                m = numpy.where(above, ms, 2.*mf + 1.)
+                part = numpy.where(above, (cf*vxf**2.*m/(12.*math.pi)*(
+                    1. + 2.*mf**2./m**2.)*numpy.sqrt(1. - 4.*mf**2./m**2.) +
+                                           cf*axf**2.*m/(12.*math.pi)*(
+                    1. - 4.*mf**2./m**2.)*numpy.sqrt(1. - 4.*mf**2./m**2.)),
+                                   0.)
+
+            # Perturbative decay into three photons via an electron loop.
             elif len(dtrs) == 3 and dtrs[0] == dtrs[1] == dtrs[2] == "gamma":
-                part = 0
+                part = numpy.zeros(ms.shape)
                 if self.xav[0]: warnings.warn(
                         "Cannot calculate width for state '%s' with non-zero "
                         "axial couplings." % state)
                 else:
                     mf = pars.mfs["e"]
-                    axf, vxf = self.xfs["e"][0](m), self.xfs["e"][1](m)
-                    if m <= 2.*mf: part = (
+                    axf = self.__vxf(ms, 0, "e")
+                    vxf = self.__vxf(ms, 1, "e")
+                    below = ms <= 2.*mf
+                    m = numpy.where(below, ms, 0.)
+                    part = numpy.where(below, (
                         ((axf**2. + vxf**2)*pars.ge**6.)/(4.*math.pi)**4./(
                         2.**7.*3.**6.*5.**2.*math.pi**3.)*(m**9./mf**8.)*(
                         17./5. + (67.*m**2.)/(42.*mf**2.) +
-                        (128941.*m**4.)/(246960.*mf**4.)))
+                        (128941.*m**4.)/(246960.*mf**4.))), 0.)
 
-            # Decay into hadrons, equations 2.17 and 2.18.
+            # Decay into hadrons.
             elif state in pars.rfs:
-                part = 0
+                part = numpy.zeros(ms.shape)
                 if self.xav[0]: warnings.warn(
                         "Cannot calculate width for state '%s' with non-zero "
                         "axial couplings." % state)
                 else:
                     for mesons, rf in pars.rfs[state].items():
                         sub = 1
-                        for meson in mesons: sub *= pars.rvs[meson]*self.trq(
-                                m, 1, pars.tms[meson])
-                        sub *= sub if len(mesons) == 1 else 2
-                        sub *= rf(m)
-                        part += m/(12*math.pi)*sub
+                        for meson in mesons: sub = sub*(pars.rvs[
+                                meson]*self.trq(ms, 1, pars.tms[meson]))
+                        sub = sub*(sub if len(mesons) == 1 else 2)
+                        sub = sub*rf(ms)
+                        part = part + ms/(12*math.pi)*sub
 
             else: raise ModelError(
                 "Unknown state '%s'." % state)
+            total = total + part
+        return total
 
-            # Cache the result.
-            total += part
-            self.__cache[state] = (m, part)
-        return g*g*total
+    ###########################################################################
+    def compile(self, masses = None, path = None, rtol = 1e-3):
+        """
+        Compile the model into width tables, after which the widths
+        are interpolated from the tables rather than calculated, for
+        masses within the range of the tables. A table is created for
+        each individual final state, i.e. the fermion pairs, the
+        exclusive hadronic states, 'gamma_gamma_gamma', 'hadrons', and
+        'dark', which are then summed for the aliases. The tables are
+        available as 'tables', and are removed if the parameters of
+        'pars' change.
+
+        The tables share an adaptive grid of masses. The grid starts
+        from the given masses, the 2*m_f fermion pair thresholds,
+        points across the rho, omega, and phi resonances, and the
+        masses of the hadronic R_mu^f grids. Each interval is then
+        bisected, at most 20 times, until the width of every state at
+        its midpoint and quarter points is reproduced within the
+        relative tolerance by linear interpolation. The tolerance is
+        only tested at these points, and is not a strict bound on the
+        interpolation error of the tables.
+
+        The tables can be persisted to a file, written with
+        'Datasets.write'. If the file exists, covers the masses, and
+        reproduces the widths for a sample of its masses, the tables
+        are read from it rather than calculated.
+
+        masses: masses (GeV) to start the grid from, by default 50 per
+                decade from 1 MeV to 100 GeV.
+        path:   optionally, the file to read the tables from or write
+                them to. If 'True', the file '<name>.wdt' alongside the
+                model file is used.
+        rtol:   relative tolerance of the interpolated widths.
+        """
+        self.tables, self.__range = None, (0, 0)
+        self.__cache.clear()
+        if masses is None: masses = [1e-3*10**(i/50.) for i in range(0, 251)]
+        masses = sorted(set(float(m) for m in masses))
+        if path is True:
+            if self.__file == None: raise ModelError(
+                "No model file for '%s' to write the tables alongside."
+                % self.name)
+            path = os.path.join(os.path.dirname(self.__file),
+                                self.name + ".wdt")
+        states = ["%s_%s" % (f, f) for f in pars.mfs] + ["hadrons", "dark"]
+        if not self.xav[0]: states += ["gamma_gamma_gamma"] + list(pars.rfs)
+
+        # Read the tables from file if they are valid.
+        if path is not None and os.path.exists(path):
+            try:
+                tables = utils.Datasets(path)
+                axis = [float(m) for m in tables[states[0]].axes[0]]
+                if sorted(tables) != sorted(states) or not (
+                        axis[0] <= masses[0] and masses[-1] <= axis[-1]):
+                    raise ModelError()
+                ms = axis[::max(1, len(axis)//8)] + axis[-1:]
+                for state, vals in zip(states, self.__widths(states, ms)):
+                    for m, val in zip(ms, vals):
+                        if abs(tables[state](m) - val) > rtol*abs(val):
+                            raise ModelError()
+                self.tables, self.__range = tables, (axis[0], axis[-1])
+                return
+            except: warnings.warn(
+                    "The width tables in '%s' are not valid for '%s' and "
+                    "are recalculated." % (path, self.name))
+
+        # Add the thresholds, resonances, and the masses of the
+        # hadronic grids, between which the widths are smooth, to the
+        # starting masses.
+        lo, hi = masses[0], masses[-1]
+        seeds = [2.*mf for mf in pars.mfs.values()] + [2.*pars.mms["K"]]
+        for meson in ["rho0", "omega", "phi"]:
+            seeds += [pars.mms[meson] + k/4.*pars.wms[meson]
+                      for k in range(-8, 9)]
+        if not self.xav[0]:
+            for rfs in pars.rfs.values():
+                for rf in rfs.values(): seeds += list(rf.axes[0])
+        for sf in pars.sfs.values(): seeds += list(sf.axes[0])
+        ms = sorted(set(masses + [float(m) for m in seeds if lo <= m <= hi]))
+        vals = dict(zip(ms, zip(*self.__widths(states, ms))))
+
+        # Bisect the intervals which are not reproduced by linear
+        # interpolation at the midpoint or quarter points. The quarter
+        # points are the midpoints of the bisected intervals, so their
+        # widths are kept for the next iteration.
+        def points(m0, m1):
+            m = (m0 + m1)/2.
+            return [x for x in [m, (m0 + m)/2., (m + m1)/2.] if m0 < x < m1]
+        todo, known = list(zip(ms[0:-1], ms[1:])), {}
+        for itr in range(0, 20):
+            todo = [(m0, m1) for m0, m1 in todo if m0 < (m0 + m1)/2. < m1]
+            if not todo: break
+            new = sorted(set([x for m0, m1 in todo for x in points(m0, m1)
+                              if not x in known]))
+            if new: known.update(zip(new, zip(*self.__widths(states, new))))
+            fails = []
+            for m0, m1 in todo:
+                for x in points(m0, m1):
+                    f = (x - m0)/(m1 - m0)
+                    if any([abs(v0 + (v1 - v0)*f - v) > rtol*abs(v) for
+                            v0, v1, v in zip(vals[m0], vals[m1], known[x])]):
+                        m = (m0 + m1)/2.
+                        vals[m] = known[m]
+                        fails += [(m0, m), (m, m1)]
+                        break
+            todo = fails
+
+        # Create the tables, and persist if requested.
+        ms = sorted(vals)
+        self.tables = utils.Datasets()
+        for idx, state in enumerate(states):
+            self.tables[state] = utils.Dataset(
+                axes = [ms], vals = [vals[m][idx] for m in ms])
+        self.__range = (ms[0], ms[-1])
+        if path is not None: self.tables.write(path, "mass", "%.16e")
+
+    ###########################################################################
+    def __widths(self, states, ms):
+        """
+        Return the calculated widths for each of the given states and
+        masses, with a global coupling of one, ignoring any compiled
+        tables, as a list for each state.
+
+        states: final states.
+        ms:     list of masses (GeV).
+        """
+        tables, self.tables = self.tables, None
+        try:
+            if utils.numpy: return [self.__vwidth(state, utils.numpy.array(
+                    ms, dtype = float)).tolist() for state in states]
+            return [[self.width(state, m) for m in ms] for state in states]
+        finally: self.tables = tables
 
     ###########################################################################
     def tau(self, m, g = 1.0):
@@ -289,9 +821,12 @@ class Model:
         Return the lifetime, in seconds, for the specified mass and
         and global coupling.
 
-        m: mass (GeV).
+        m: mass (GeV), or array of masses.
         g: global coupling (unitless).
         """
+        if isinstance(m, ndarray):
+            with utils.numpy.errstate(divide = "ignore"):
+                return pars.hbar/self.width("total", m, g)
         return pars.hbar/self.width("total", m, g)
 
     ###########################################################################
@@ -299,9 +834,10 @@ class Model:
         """
         Return the global coupling, for the specified mass and lifetime.
 
-        m:   mass (GeV).
+        m:   mass (GeV), or array of masses.
         tau: lifetime (seconds).
         """
+        if isinstance(m, ndarray): return utils.numpy.sqrt(self.tau(m)/tau)
         return math.sqrt(self.tau(m)/tau)
 
     ###########################################################################
@@ -311,8 +847,15 @@ class Model:
 
         states: final state or states, see the documentation for this class 
                 for details.
-        m:      mass (GeV).
+        m:      mass (GeV), or array of masses.
         """
+        if isinstance(m, ndarray):
+            numpy = utils.numpy
+            num = self.width(states, m)
+            if num is None: return numpy.ones(m.shape)
+            den = self.width("total", m)
+            with numpy.errstate(divide = "ignore", invalid = "ignore"):
+                return numpy.where((num == 0) | (den == 0), 0., num/den)
         num = self.width(states, m)
         if num == 0: return 0.0
         elif num == None: return 1.0
@@ -347,3 +890,204 @@ class Models(collections.OrderedDict):
                 try: self[model[0:-3]] = Model(
                         model[0:-3], states, dwidth, path)
                 except: warnings.warn("Cannot load model '%s'." % model)
+
+###############################################################################
+class BasisWidths:
+    """
+    Provides the widths for any fermion couplings on a fixed grid of
+    masses. Every width, other than the dark sector width, is a
+    quadratic form in the fermion couplings: the perturbative widths
+    are diagonal in the (axial, vector) couplings of each fermion,
+    while the hadronic widths are products of the quark traces, see
+    'Model.trq'. The coefficient matrix W(m) for each state is
+    calculated once per mass, and the width for couplings c(m) is then
+    c(m)^T W(m) c(m). This allows many coupling hypotheses to be
+    scanned without creating a 'Model' for each. The NumPy module is
+    required.
+
+    The couplings are passed as an array broadcastable to the shape
+    (..., N, 12, 2), for N masses, with the (axial, vector) coupling
+    for each fermion in the order of 'pars.mfs', see
+    'Model.couplings'. A single set of constant couplings can be
+    passed with shape (12, 2), and H sets with shape (H, 1, 12, 2). An
+    array of widths with shape (..., N) is returned.
+
+    The same final states and aliases as for 'Model' are available.
+    By default 'total' is 'visible' and 'invisible', and the dark
+    sector width, which is not a quadratic form in the couplings, is
+    zero, but both can be given to 'width'. As for 'Model', the
+    exclusive hadronic
+    states and 'gamma_gamma_gamma' are zero for any couplings with a
+    non-zero axial coupling.
+
+    masses: masses (GeV) of the grid.
+    states: coefficient matrices for each individual final state, as
+            a tuple of the (fermion, type) coupling indices and the
+            array of matrices with shape (N, k, k) for k indices.
+    """
+    ###########################################################################
+    def __init__(self, masses):
+        """
+        Calculate the coefficient matrices for each individual final
+        state on a grid of masses.
+
+        masses: masses (GeV) of the grid.
+        """
+        if not utils.numpy: raise ModelError(
+            "The NumPy module is required for 'BasisWidths'.")
+        self.masses = utils.numpy.array(masses, dtype = float).ravel()
+        self.__version, self.states = None, {}
+        self.__calculate()
+
+    ###########################################################################
+    def __calculate(self):
+        """
+        Calculate the coefficient matrices, if the parameters of 'pars'
+        have changed since they were last calculated.
+        """
+        if self.__version == pars.version: return
+        numpy, ms, fs = utils.numpy, self.masses, list(pars.mfs)
+        self.__version, self.states = pars.version, {}
+        u, d, s = fs.index("u"), fs.index("d"), fs.index("s")
+        zeros = lambda k: numpy.zeros((len(ms), k, k))
+
+        # Perturbative decay into a fermion pair, diagonal in the
+        # (axial, vector) couplings.
+        for f, mf in pars.mfs.items():
+            cf, above = pars.cfs[f], ms > 2.*mf
+            m = numpy.where(above, ms, 2.*mf + 1.)
+            w = zeros(2)
+            w[:, 0, 0] = numpy.where(above, cf*m/(12.*math.pi)*(
+                1. - 4.*mf**2./m**2.)*numpy.sqrt(1. - 4.*mf**2./m**2.), 0.)
+            w[:, 1, 1] = numpy.where(above, cf*m/(12.*math.pi)*(
+                1. + 2.*mf**2./m**2.)*numpy.sqrt(1. - 4.*mf**2./m**2.), 0.)
+            self.states["%s_%s" % (f, f)] = ([(fs.index(f), 0),
+                                              (fs.index(f), 1)], w)
+
+        # Perturbative decay into three photons via an electron loop.
+        mf, below = pars.mfs["e"], ms <= 2.*pars.mfs["e"]
+        m, w = numpy.where(below, ms, 0.), zeros(2)
+        w[:, 0, 0] = w[:, 1, 1] = numpy.where(below, pars.ge**6./(
+            4.*math.pi)**4./(2.**7.*3.**6.*5.**2.*math.pi**3.)*(
+                m**9./mf**8.)*(17./5. + (67.*m**2.)/(42.*mf**2.) +
+                               (128941.*m**4.)/(246960.*mf**4.)), 0.)
+        self.states["gamma_gamma_gamma"] = ([(fs.index("e"), 0),
+                                             (fs.index("e"), 1)], w)
+
+        # Decay into hadrons, in the vector (u, d, s) couplings. The
+        # cross term of two mesons is split symmetrically.
+        vector = [(u, 1), (d, 1), (s, 1)]
+        hadrons = zeros(6)
+        for state, rfs in pars.rfs.items():
+            w = zeros(3)
+            for mesons, rf in rfs.items():
+                ts = [pars.rvs[meson]*numpy.array(pars.tms[meson])
+                      for meson in mesons]
+                t0, t1 = ts[0], ts[-1]
+                outer = (numpy.outer(t0, t1) if len(mesons) == 1 else
+                         numpy.outer(t0, t1) + numpy.outer(t1, t0))
+                w += (ms/(12*math.pi)*rf(ms))[:, None, None]*outer
+            self.states[state] = (vector, w)
+            hadrons[:, 3:, 3:] += w
+
+        # Axial hadronic component, in the axial (u, d, s) couplings.
+        sud, ss = pars.sfs["u_d"](ms), pars.sfs["s"](ms)
+        ps = numpy.where(ms > 2*pars.mms["K"], 1., 0.)
+        t = numpy.array([1., -1., 0.])
+        hadrons[:, 0:3, 0:3] += (ms/(4.*math.pi)*sud)[
+            :, None, None]*numpy.outer(t, t)
+        hadrons[:, 2, 2] += ms/(4.*math.pi)*ps*(
+            sud/4. + ss - pars.cphi*(sud*ss)**0.5)
+        self.states["hadrons"] = ([(u, 0), (d, 0), (s, 0)] + vector, hadrons)
+
+    ###########################################################################
+    def width(self, states, couplings, g = 1.0, total = None, dark = None):
+        """
+        Return the widths, in GeV, for the specified states and
+        couplings on the grid of masses.
+
+        states:    final state or states, see the documentation for
+                   'Model'.
+        couplings: array of (axial, vector) fermion couplings, see the
+                   documentation for this class.
+        g:         global coupling (unitless).
+        total:     optionally, the final states of the total width,
+                   e.g. 'Model.states'.
+        dark:      optionally, the dark sector widths with a global
+                   coupling of one, broadcastable to the widths.
+        """
+        numpy = utils.numpy
+        self.__calculate()
+        cs = numpy.asarray(couplings, dtype = float)
+        if cs.ndim == 2: cs = cs[None]
+        axial = numpy.any(cs[..., 0] != 0, axis = (-2, -1))
+        part = self.__width(states, cs, axial[..., None], total or [
+            "visible", "invisible"], 0. if dark is None else dark)
+        return None if part is None else g*g*part
+
+    ###########################################################################
+    def __width(self, states, cs, axial, total, dark):
+        """
+        Return the widths for the specified states and couplings, with
+        a global coupling of one.
+
+        states: final state or states.
+        cs:     array of couplings.
+        axial:  flags if the couplings have non-zero axial couplings.
+        total:  final states of the total width.
+        dark:   dark sector widths.
+        """
+        numpy, width = utils.numpy, 0.
+        for state in (states,) if isinstance(states, str) else states:
+            if state == "none": return None
+            elif state == "total": state = total
+            elif state == "invisible": state = ["dark", "neutrinos"]
+            elif state == "visible": state = [
+                    "leptons", "quarks", "hadrons", "gamma_gamma_gamma"]
+            elif state == "neutrinos": state = [
+                    "nue_nue", "numu_numu", "nutau_nutau"]
+            elif state == "leptons": state = ["e_e", "mu_mu", "tau_tau"]
+            elif state == "quarks": state = ["c_c", "b_b", "t_t"]
+            elif state == "dark":
+                width = width + dark
+                continue
+            elif state not in self.states: raise ModelError(
+                "Unknown state '%s'." % state)
+            if not isinstance(state, str):
+                width = width + self.__width(state, cs, axial, total, dark)
+                continue
+
+            # Evaluate the quadratic form. For couplings constant in
+            # mass this is a single matrix product over the masses.
+            idxs, w = self.states[state]
+            c = cs[..., [i for i, j in idxs], [j for i, j in idxs]]
+            cc = c[..., :, None]*c[..., None, :]
+            if cc.shape[-3] == 1: part = numpy.matmul(
+                    cc.reshape(cc.shape[0:-3] + (1, w.shape[1]**2)),
+                    w.reshape(len(w), -1).T)[..., 0, :]
+            else: part = (cc*w).sum(axis = (-2, -1))
+            if state != "hadrons" and (state in pars.rfs or state ==
+                                       "gamma_gamma_gamma"):
+                part = numpy.where(axial, 0., part)
+            width = width + part
+        return width + numpy.zeros(len(self.masses))
+
+    ###########################################################################
+    def bfrac(self, states, couplings, total = None, dark = None):
+        """
+        Return the branching fractions for the specified states and
+        couplings on the grid of masses.
+
+        states:    final state or states, see the documentation for
+                   'Model'.
+        couplings: array of (axial, vector) fermion couplings, see the
+                   documentation for this class.
+        total:     optionally, the final states of the total width.
+        dark:      optionally, the dark sector widths, see 'width'.
+        """
+        numpy = utils.numpy
+        num = self.width(states, couplings, total = total, dark = dark)
+        den = self.width("total", couplings, total = total, dark = dark)
+        if num is None: return numpy.ones(den.shape)
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            return numpy.where((num == 0) | (den == 0), 0., num/den)
@@ -22,25 +22,26 @@
 #  year          = "2017"
 # }
 
-# Parameters defining the model.
-the = 0.1  # Mixing parameter.
-qhd = 0.1  # Up-type Higgs charge.
-qhu = 2.   # Down-type Higgs charge.
-sw2 = 0.22 # sin^2(Weinberg angle).
-kap = 0.   # Muon vector coupling with respect to the electron.
-
-# Define the fermion couplings (axial, vector). Taken from tables 2 - 4.
-xfs = {
-    "e":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2*sw2)),
-    "mu":    (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2*sw2) + kap),
-    "tau":   (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2*sw2) - kap),
-    "nue":   (0.5*the,            0.5*the),
-    "numu":  (0.5*(the + kap),    0.5*(the + kap)),
-    "nutau": (0.5*(the - kap),    0.5*(the - kap)),
-    "d":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2./3.*sw2)), 
-    "u":     (-0.5*qhu + 0.5*the, 0.5*qhu + the*( 0.5 - 4./3.*sw2)), 
-    "s":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2./3.*sw2)), 
-    "c":     (-0.5*qhu + 0.5*the, 0.5*qhu + the*( 0.5 - 4./3.*sw2)),
-    "b":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2./3.*sw2)), 
-    "t":     (-0.5*qhu + 0.5*the, 0.5*qhu + the*( 0.5 - 4./3.*sw2))
-    }
+# Define the fermion couplings (axial, vector), taken from tables 2 - 4,
+# as a function of the parameters defining the model family. Other
+# members of the family can be loaded with, e.g. Model('2hdm',
+# parameters = {'the': 0.2}), or 'Model.vary'.
+def xfs(the = 0.1,  # Mixing parameter.
+        qhd = 0.1,  # Up-type Higgs charge.
+        qhu = 2.,   # Down-type Higgs charge.
+        sw2 = 0.22, # sin^2(Weinberg angle).
+        kap = 0.):  # Muon vector coupling with respect to the electron.
+    return {
+        "e":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2*sw2)),
+        "mu":    (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2*sw2) + kap),
+        "tau":   (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2*sw2) - kap),
+        "nue":   (0.5*the,            0.5*the),
+        "numu":  (0.5*(the + kap),    0.5*(the + kap)),
+        "nutau": (0.5*(the - kap),    0.5*(the - kap)),
+        "d":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2./3.*sw2)),
+        "u":     (-0.5*qhu + 0.5*the, 0.5*qhu + the*( 0.5 - 4./3.*sw2)),
+        "s":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2./3.*sw2)),
+        "c":     (-0.5*qhu + 0.5*the, 0.5*qhu + the*( 0.5 - 4./3.*sw2)),
+        "b":     (-0.5*qhd - 0.5*the, 0.5*qhd + the*(-0.5 + 2./3.*sw2)),
+        "t":     (-0.5*qhu + 0.5*the, 0.5*qhu + the*( 0.5 - 4./3.*sw2))
+        }
@@ -38,8 +38,15 @@ sfs:  interpolation grids for the light and strange spectral functions
 pff:  proton form factor coefficient (unitless).
 pms:  proton form factor masses (axial, vector) (GeV).
 piff: pion form factor coefficient (unitless).
+
+Changes to the parameters are counted by 'version', which is increased
+whenever a parameter is redefined, e.g. 'darkcast.pars.ge = 1', or an
+entry of a dictionary parameter, or of a dictionary within one, is
+changed, e.g. 'darkcast.pars.mfs["e"] = 5e-4' or
+'darkcast.pars.rfs["pi+_pi-"][("rho0",)] = grid'. This is used to invalidate cached
+results, e.g. the widths of a 'Model'.
 """
-import math
+import sys, types, math
 from . import utils
 
 ###############################################################################
@@ -184,6 +191,82 @@ pms = [0.84, 1.01]
 # form factor for the pion (gamma), taken from Bay:1986kf.
 piff = 0.52
 
+###############################################################################
+# Count changes to the parameters.
+version = 0
+
+###############################################################################
+class Parameters(dict):
+    """
+    Dictionary of parameters which increases 'version' when changed,
+    by any of the methods which modify a dictionary. Dictionary
+    values, e.g. the grids of 'rfs', are also converted to
+    'Parameters', so changes to these are counted too.
+    """
+    def __init__(self, *args, **kwargs):
+        super(Parameters, self).__init__()
+        for key, val in dict(*args, **kwargs).items():
+            super(Parameters, self).__setitem__(key, parameters(val))
+    def __setitem__(self, key, val):
+        global version
+        super(Parameters, self).__setitem__(key, parameters(val))
+        version += 1
+    def __delitem__(self, key):
+        global version
+        super(Parameters, self).__delitem__(key); version += 1
+    def __ior__(self, other):
+        self.update(other); return self
+    def update(self, *args, **kwargs):
+        global version
+        for key, val in dict(*args, **kwargs).items():
+            super(Parameters, self).__setitem__(key, parameters(val))
+        version += 1
+    def setdefault(self, key, val = None):
+        if not key in self: self[key] = val
+        return self[key]
+    def pop(self, *args):
+        global version
+        size = len(self)
+        val = super(Parameters, self).pop(*args)
+        if len(self) != size: version += 1
+        return val
+    def popitem(self):
+        global version
+        item = super(Parameters, self).popitem(); version += 1
+        return item
+    def clear(self):
+        global version
+        super(Parameters, self).clear(); version += 1
+
+def parameters(val):
+    """
+    Return a value as a parameter, converting dictionaries, including
+    nested dictionaries, to 'Parameters'.
+
+    val: value to convert.
+    """
+    if isinstance(val, dict) and not isinstance(val, Parameters):
+        return Parameters(val)
+    return val
+
+###############################################################################
+class Module(types.ModuleType):
+    """
+    Parameters module which increases 'version' when a parameter is
+    redefined. Dictionary parameters, including nested dictionaries,
+    are converted to 'Parameters'.
+    """
+    def __setattr__(self, name, val):
+        if name == "version": return super(Module, self).__setattr__(
+                name, val)
+        super(Module, self).__setattr__(name, parameters(val))
+        super(Module, self).__setattr__("version", self.version + 1)
+
 # Clean up.
 try: del t, rf, mesons
 except: pass
+for key, val in list(globals().items()):
+    if not key.startswith("__") and isinstance(val, dict):
+        globals()[key] = parameters(val)
+del key, val
+sys.modules[__name__].__class__ = Module
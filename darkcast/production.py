@@ -89,6 +89,8 @@ class Production:
     name:     name of the production.
     channels: list of production channels taking the form 
               [production of type 'Production', production fraction function]
+    fast:     true if the production is assumed to depend upon the square
+              of the global coupling, and so the ratio is cached.
     """
     ###########################################################################
     def __init__(self, channels, frac = 1.0):
@@ -137,12 +139,15 @@ class Production:
         self.name = "undefined"
         self.fast = True
         self.__cache = (None, None)
+        self.__fracs = None
 
-        # Multiple mechanisms from a dictionary.
+        # Multiple mechanisms from a dictionary. The fractions from a
+        # 'Datasets' are interpolated together.
         try:
             self.channels = []
             for prd, frc in channels.items():
                 self.channels.append(Production(prd, frc))
+            if isinstance(channels, utils.Datasets): self.__fracs = channels
             return
         except: pass
 
@@ -209,6 +214,7 @@ class Production:
             except:
                 self.__sigma(0, 1, model.Model("dark_photon"))
                 self.__cache = False
+                self.fast = False
             
         # Set the channels.
         try: float(frac); self.__frac = lambda m, frac = frac: float(frac)
@@ -234,10 +240,12 @@ class Production:
 
             # Calculate the result, equation 2.12.
             ratio = 0
-            for channel in self.channels:
+            fracs = self.__fracs(m) if self.__fracs else [
+                None]*len(self.channels)
+            for channel, frac in zip(self.channels, fracs):
                 den = channel.__sigma(m, model1)
-                if den: ratio += channel.__frac(m)*channel.__sigma(
-                        m, model0)/den
+                if den: ratio += (channel.__frac(m) if frac == None else
+                                  frac)*channel.__sigma(m, model0)/den
             self.__cache = (m, ratio)
             return (g0/g1)**2*ratio
         # Calculate the full coupling dependent ratio with no cache.
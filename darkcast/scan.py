@@ -0,0 +1,122 @@
+# DARKCAST is licensed under the GNU GPL version 2 or later.
+# Copyright (C) 2023 DARKCAST authors (see AUTHORS.md).
+import itertools, collections
+from . import utils
+from .model import Model, BasisWidths
+
+###############################################################################
+class ScanError(Exception):
+    """
+    Simple exception for the 'Scan' class.
+    """
+    pass
+
+###############################################################################
+class Scan:
+    """
+    Scans the parameters of a model family, see 'Model', over a grid
+    of points. The widths and branching fractions for every point are
+    evaluated together on a grid of masses, and the limits can be
+    recast for every point. All the precomputation which does not
+    depend on the parameters is done once: the model module is
+    imported once, and if the NumPy module is available the widths are
+    evaluated from a single 'BasisWidths' for the masses.
+
+    model:     the model family, of type 'Model'.
+    points:    list of the parameter dictionaries for each point.
+    models:    list of the 'Model' for each point.
+    masses:    masses (GeV) at which the widths are evaluated.
+    basis:     'BasisWidths' for the masses, or 'None' if the NumPy
+               module is not available.
+    couplings: array of the couplings for each point and mass, with
+               shape (P, N, 12, 2) for P points and N masses, or 'None'
+               if the NumPy module is not available.
+    """
+    ###########################################################################
+    def __init__(self, model, grid, masses):
+        """
+        Create the scan, given a model family and a grid of its
+        parameters.
+
+        model:  the model family, either a 'Model' or the name of the
+                model.
+        grid:   either a dictionary of the values for each parameter,
+                where the points are all the combinations of the
+                values, with the last parameter varying fastest, or a
+                list of parameter dictionaries. Parameters which are
+                not given keep the values of 'model'.
+        masses: masses (GeV) at which to evaluate the widths.
+        """
+        self.model = model if isinstance(model, Model) else Model(model)
+        if not self.model.parameters: raise ScanError(
+            "The model '%s' is not a model family." % self.model.name)
+        if isinstance(grid, dict):
+            self.points = [collections.OrderedDict(zip(grid, vals)) for
+                           vals in itertools.product(*grid.values())]
+        else: self.points = [dict(point) for point in grid]
+        self.models = [self.model.vary(point) for point in self.points]
+        self.points = [model.parameters for model in self.models]
+        self.masses = [float(m) for m in masses]
+        self.basis, self.couplings, self.__dark = None, None, None
+        if utils.numpy:
+            self.masses = utils.numpy.array(self.masses)
+            self.basis = BasisWidths(self.masses)
+            self.couplings = utils.numpy.array([
+                model.couplings(self.masses) for model in self.models])
+
+    ###########################################################################
+    def __len__(self): return len(self.points)
+
+    ###########################################################################
+    def width(self, states, g = 1.0):
+        """
+        Return the widths, in GeV, for the specified states and global
+        coupling, for each point and mass. An array of shape (P, N) is
+        returned if the NumPy module is available, otherwise a list of
+        lists.
+
+        states: final state or states, see the documentation for 'Model'.
+        g:      global coupling (unitless).
+        """
+        if self.basis == None: return [[model.width(states, m, g) for m in
+                                        self.masses] for model in self.models]
+        return self.basis.width(states, self.couplings, g,
+                                self.model.states, self.__darks())
+
+    ###########################################################################
+    def bfrac(self, states):
+        """
+        Return the branching fractions for the specified states, for
+        each point and mass, see 'width'.
+
+        states: final state or states, see the documentation for 'Model'.
+        """
+        if self.basis == None: return [[model.bfrac(states, m) for m in
+                                        self.masses] for model in self.models]
+        return self.basis.bfrac(states, self.couplings, self.model.states,
+                                self.__darks())
+
+    ###########################################################################
+    def __darks(self):
+        """
+        Return the dark sector widths for each point and mass, or 'None'
+        if these are all zero.
+        """
+        if self.__dark is None:
+            dark = utils.numpy.array([model.width("dark", self.masses)
+                                      for model in self.models])
+            self.__dark = dark if dark.any() else False
+        return None if self.__dark is False else self.__dark
+
+    ###########################################################################
+    def recast(self, limit, **options):
+        """
+        Return the recast limit for each point, see 'Limit.recast'. The
+        points are recast in turn, and nothing is batched between them.
+        Only the widths of the limit model, which are kept in its width
+        cache, are calculated once and reused by the later points.
+
+        limit:   limit to recast, of type 'Limit'.
+        options: options passed to 'Limit.recast'.
+        """
+        return [limit.recast(model, **options) for model in self.models]
@@ -1,6 +1,8 @@
 # DARKCAST is licensed under the GNU GPL version 2 or later.
 # Copyright (C) 2023 DARKCAST authors (see AUTHORS.md).
-import os, sys, importlib, inspect, operator, collections, math
+import os, sys, importlib, inspect, operator, collections, itertools, math
+try: import numpy
+except: numpy = None
 
 ###############################################################################
 def envpaths(var, rel = ""):
@@ -60,6 +62,106 @@ def find(name):
             return os.path.join(path, name)
     return None
 
+###############################################################################
+def cachepath(path, kind):
+    """
+    Return the path of the binary cache for a data file, read as a
+    given kind of object. The cache
+    directory is given by the environment variable
+    'DARKCAST_CACHE_PATH', or '~/.cache/darkcast' if not defined. If
+    the NumPy module is not available, or 'DARKCAST_CACHE_PATH' is
+    defined but empty, caching is disabled and 'None' is returned.
+
+    path: absolute path of the data file.
+    kind: kind of object read from the file, e.g. 'Dataset'.
+    """
+    import hashlib
+    if not numpy: return None
+    var = os.getenv("DARKCAST_CACHE_PATH")
+    if var == None: var = os.path.join("~", ".cache", "darkcast")
+    if not var: return None
+    var = os.path.abspath(os.path.expanduser(os.path.expandvars(var)))
+    return os.path.join(var, "%s.%s.%s.bin" % (os.path.basename(path), kind,
+        hashlib.sha1(path.encode("utf-8")).hexdigest()[0:12]))
+
+###############################################################################
+def cacheread(path, kind):
+    """
+    Read the binary cache for a data file, returning the tuple
+    (arrays, keys) where 'arrays' are the cached arrays and 'keys'
+    any cached labels. The cache is valid when the size of the data
+    file is unchanged and either its modification time or SHA-1 hash
+    is unchanged. All the arrays are read-write views into a single
+    copy-on-write memory map of the cache, so the cache itself is
+    never modified. If no valid cache exists, 'None' is returned.
+
+    path: absolute path of the data file.
+    kind: kind of object read from the file, e.g. 'Dataset'.
+    """
+    import json, mmap, hashlib
+    cache = cachepath(path, kind)
+    if not cache or not os.path.isfile(cache): return None
+    try:
+        with open(cache, "rb") as data:
+            if data.readline() != b"DARKCAST CACHE 1\n": return None
+            head, stat = json.loads(data.readline().decode()), os.stat(path)
+            if head["size"] != stat.st_size: return None
+            touched = head["mtime"] != stat.st_mtime_ns
+            if touched:
+                with open(path, "rb") as src:
+                    if head["sha1"] != hashlib.sha1(
+                        src.read()).hexdigest(): return None
+            buf = mmap.mmap(data.fileno(), 0, access = mmap.ACCESS_COPY)
+        arrays, offset = [], head["offset"]
+        for size in head["sizes"]:
+            arrays.append(numpy.frombuffer(
+                buf, numpy.float64, size, offset))
+            offset += 8*size
+        if touched: cachewrite(path, kind, arrays, head["keys"])
+        return arrays, head["keys"]
+    except: return None
+
+###############################################################################
+def cachewrite(path, kind, arrays, keys = None):
+    """
+    Write the binary cache for a data file. The cache consists of a
+    two line text header, followed by the arrays stored contiguously
+    as float64 values. The cache is first written to a temporary file
+    and then moved into place, and any failure, e.g. an unwritable
+    cache directory, is silently ignored.
+
+    path:   absolute path of the data file.
+    kind:   kind of object read from the file, e.g. 'Dataset'.
+    arrays: arrays of floats to cache.
+    keys:   optional labels to cache.
+    """
+    import json, hashlib, tempfile
+    cache = cachepath(path, kind)
+    if not cache: return
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as src: sha1 = hashlib.sha1(src.read())
+        head = {"size": stat.st_size, "mtime": stat.st_mtime_ns,
+                "sha1": sha1.hexdigest(), "keys": keys,
+                "sizes": [len(a) for a in arrays], "offset": 0}
+        magic = b"DARKCAST CACHE 1\n"
+        line = (json.dumps(head) + "\n").encode()
+        head["offset"] = 8*int((len(magic) + len(line) + 64)/8)
+        line = (json.dumps(head) + "\n").encode()
+        line = line[0:-1] + b" "*(head["offset"] - len(magic) - len(line)
+                                  ) + b"\n"
+        if not os.path.isdir(os.path.dirname(cache)):
+            os.makedirs(os.path.dirname(cache))
+        fd, tmp = tempfile.mkstemp(dir = os.path.dirname(cache))
+        with os.fdopen(fd, "wb") as data:
+            data.write(magic + line)
+            for a in arrays: data.write(
+                    numpy.ascontiguousarray(a, numpy.float64).tobytes())
+        os.replace(tmp, cache)
+    except:
+        try: os.remove(tmp)
+        except: pass
+
 ###############################################################################
 def prod(vs):
     """
@@ -81,6 +183,87 @@ def trace(*ts):
     """
     return sum(prod(t) for t in zip(*ts))
 
+###############################################################################
+def array(vs):
+    """
+    Return a contiguous array of floats for an iterable object. If
+    the NumPy module is available a float64 'numpy.ndarray' is
+    returned, otherwise a list of floats is returned.
+
+    vs: iterable values to convert.
+    """
+    if numpy: return numpy.ascontiguousarray(vs, dtype = numpy.float64)
+    return [float(v) for v in vs]
+
+###############################################################################
+def table(data, cols = None):
+    """
+    Return the rows of a whitespace separated text table as a 2D
+    float64 array, read in a single columnar pass. Comments starting
+    with '#' and blank lines are skipped. If the NumPy module is not
+    available, or the table is empty or malformed, 'None' is returned
+    and the file is rewound, so the caller can read it line by line
+    and report any malformed line.
+
+    data: open text file, positioned at the start of the table.
+    cols: required number of columns, otherwise at least two.
+    """
+    import warnings
+    if not numpy: return None
+    pos = data.tell()
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            rows = numpy.loadtxt(data, dtype = numpy.float64, ndmin = 2)
+        if rows.size and (rows.shape[1] == cols if cols else
+                          rows.shape[1] > 1): return rows
+    except: pass
+    data.seek(pos)
+    return None
+
+###############################################################################
+def thin(xs, vals, rtol, atol = 0):
+    """
+    Return the indices of the points along an axis which are kept when
+    thinning the axis. A point is removed when its values are
+    reproduced by linear interpolation between the neighboring kept
+    points within |v' - v| <= rtol*|v| + atol. The points are removed
+    greedily, extending each interval between kept points as far as
+    possible.
+
+    xs:   sorted axis points.
+    vals: values for each axis point, with shape (n, m) for n axis
+          points and m values per point.
+    rtol: relative tolerance.
+    atol: absolute tolerance.
+    """
+    n = len(xs)
+    if n < 3: return list(range(n))
+    if numpy: xs, vals = array(xs), numpy.asarray(vals)
+
+    # Check if the values between two points are reproduced.
+    def close(i, j):
+        x0, x1 = xs[i], xs[j]
+        if numpy:
+            x = xs[i + 1:j, None]
+            val = (x1 - x)/(x1 - x0)*vals[i] + (x - x0)/(x1 - x0)*vals[j]
+            return bool((abs(val - vals[i + 1:j]) <= rtol*abs(
+                vals[i + 1:j]) + atol).all())
+        for x, vs in zip(xs[i + 1:j], vals[i + 1:j]):
+            for v, v0, v1 in zip(vs, vals[i], vals[j]):
+                val = (x1 - x)/(x1 - x0)*v0 + (x - x0)/(x1 - x0)*v1
+                if not abs(val - v) <= rtol*abs(v) + atol: return False
+        return True
+
+    # Extend each interval greedily.
+    keep, i = [0], 0
+    while i < n - 1:
+        j = i + 1
+        while j + 1 < n and close(i, j + 1): j += 1
+        keep.append(j)
+        i = j
+    return keep
+
 ###############################################################################
 class SolveError(Exception):
     """
@@ -89,69 +272,331 @@ class SolveError(Exception):
     pass
 
 ###############################################################################
-def solve(f, x0 = None, x1 = None, x = 1, tol = 1e-2, itrs = 100):
+class SolveStats:
+    """
+    Counts the work done by 'solve', accumulated over all the solves
+    it is passed to.
+
+    solves:     number of solves.
+    evals:      number of function evaluations.
+    itrs:       number of iterations of the root finding method.
+    expansions: number of bracket expansions.
+    """
+    ###########################################################################
+    def __init__(self):
+        """
+        Initialize the counts to zero.
+        """
+        self.solves, self.evals, self.itrs, self.expansions = 0, 0, 0, 0
+
+    ###########################################################################
+    def __repr__(self):
+        """
+        Return the representation of the counts.
+        """
+        return "SolveStats(solves = %i, evals = %i, itrs = %i, " \
+            "expansions = %i)" % (
+                self.solves, self.evals, self.itrs, self.expansions)
+
+###############################################################################
+def solve(f, x0 = None, x1 = None, x = 1, tol = 1e-2, itrs = 100,
+          method = "ridders", evals = None, stats = None):
     """
     Solve a zero for a function, 'f(x)', using Ridders' method and
     with the assumption that x >= 0. If no bracketing interval for the
     zero is provided, then the method tries to determine an initial
     bracket. If a lower bracket value is provided, then an attempt is
     made to determine the upper value, and vice versa. Alternatively,
-    a starting value for the bracket finding can be provided.
+    a starting value for the bracket finding can be provided. If both
+    bracket values are provided, the bracket is used as given. If the
+    method is 'brent', then the zero is solved in log(x) with Brent's
+    method, see 'brent'.
 
-    f:    function to solve, must take a single float argument, e.g. 'f(x)'.
-    x0:   optional lower bracket value.
-    x1:   optional upper bracket value.
-    x:    optional starting value for bracket finding.
-    tol:  relative tolerance required on x.
-    itrs: maximum number of iterations.
+    f:      function to solve, must take a single float argument, 
+            e.g. 'f(x)'.
+    x0:     optional lower bracket value.
+    x1:     optional upper bracket value.
+    x:      optional starting value for bracket finding.
+    tol:    relative tolerance required on x.
+    itrs:   maximum number of iterations.
+    method: method to use, either 'ridders' or 'brent'.
+    evals:  optional maximum number of function evaluations.
+    stats:  optional 'SolveStats' to add the counts of this solve to.
     """
+    if method == "brent": return brent(f, x0, x1, x, tol, itrs, evals, stats)
+    elif method != "ridders": raise SolveError(
+        "Unknown method '%s'." % method)
+    stats = SolveStats() if stats == None else stats
+    stats.solves += 1
+    n = stats.evals + int(evals) if evals != None else None
+    def fx(x):
+        if n != None and stats.evals >= n: raise SolveError(
+            "Exceeded the budget of %i evaluations." % evals)
+        stats.evals += 1
+        return f(x)
+
     # Guess the initial bracket.
     sx, g0, g1 = 2.0, x0 == None, x1 == None
     if g0 and not g1: x0 = x1/sx
     elif g1 and not g0: x1 = x0*sx
-    else: x0, x1 = x*0.8, x*1.2
-    f0, f1 = f(x0), f(x1)
+    elif g0 and g1: x0, x1 = x*0.8, x*1.2
+    f0, f1 = fx(x0), fx(x1)
     
     # Expand the bracket if needed.
     if g0 and not g1:
         for itr in range(0, int(itrs)):
             if f0*f1 < 0: break
             x0 = x0/sx
-            f0 = f(x0)
+            stats.expansions += 1; f0 = fx(x0)
     elif g1 and not g0:
         for itr in range(0, int(itrs)):
             if f0*f1 < 0: break
             x1 = x1*sx
-            f1 = f(x1)
-    else:
+            stats.expansions += 1; f1 = fx(x1)
+    elif g0 and g1:
         xmin, xmax, fmin, fmax = x0, x1, f0, f1
         if fmin < fmax: xmin, xmax, fmin, fmax = xmax, xmin, fmax, fmin
         for itr in range(0, int(itrs)):
             if fmin*fmax < 0: break
             x0, x1 = x0/sx, x1*sx
-            f0, f1 = f(x0), f(x1)
+            stats.expansions += 1
+            f0, f1 = fx(x0), fx(x1)
             if f0 < fmin: xmin, fmin = x0, f0
             if f1 < fmin: xmin, fmin = x1, f1
             if f0 > fmax: xmax, fmax = x0, f0
             if f1 > fmax: xmax, fmax = x1, f1
         x0, x1, f0, f1 = xmin, xmax, fmin, fmax
-        if x0 > x1: x0, x1, f0, f1 = x1, x0, f1, f0
+    if x0 > x1: x0, x1, f0, f1 = x1, x0, f1, f0
     if not f0*f1 < 0: raise SolveError(
         "Could not find bracketing interval.")
 
     # Apply Ridders' method.
     for itr in range(0, int(itrs)):
+        stats.itrs += 1
         xm = (x0 + x1)/2.0
-        fm = f(xm)
+        fm = fx(xm)
         xn = xm + (xm - x0)*(-1.0 if f0 < 0 else 1.0)*fm/math.sqrt(
             fm**2 - f0*f1)
-        fn = f(xn)
+        fn = fx(xn)
         if fn == 0.0 or abs(x1 - x0)/xn < tol: return xn
         elif fn*fm < 0: x0, x1, f0, f1 = xn, xm, fn, fm
         elif fn*f0 < 0: x1, f1 = xn, fn
         else: x0, f0 = xn, fn
     raise SolveError("Could not find a solution.")
 
+###############################################################################
+def brent(f, x0 = None, x1 = None, x = 1, tol = 1e-2, itrs = 100,
+          evals = None, stats = None):
+    """
+    Solve a zero for a function, 'f(x)', using Brent's method in
+    log(x), with the assumption that x > 0. This is better suited
+    than 'solve' with Ridders' method to zeros which may lie over many
+    orders of magnitude. The bracket is found as for 'solve', but with
+    steps in log(x) which double with each expansion, and only
+    stepping down if an upper bracket value is provided, up if a lower
+    value is provided, and otherwise towards the smaller absolute
+    function value. If both bracket values are provided, the bracket
+    is used as given. The last two function values are kept as the
+    bracket, and Brent's method then starts from these, using inverse
+    quadratic interpolation where possible and bisection otherwise.
+
+    f:     function to solve, must take a single float argument, 
+           e.g. 'f(x)'.
+    x0:    optional lower bracket value.
+    x1:    optional upper bracket value.
+    x:     optional starting value for bracket finding.
+    tol:   relative tolerance required on x.
+    itrs:  maximum number of iterations, for both the bracket finding
+           and Brent's method.
+    evals: optional maximum number of function evaluations.
+    stats: optional 'SolveStats' to add the counts of this solve to.
+    """
+    stats = SolveStats() if stats == None else stats
+    stats.solves += 1
+    n = stats.evals + int(evals) if evals != None else None
+    def g(u):
+        if n != None and stats.evals >= n: raise SolveError(
+            "Exceeded the budget of %i evaluations." % evals)
+        stats.evals += 1
+        return f(math.exp(u))
+    if any([v != None and not v > 0 for v in (x0, x1)] + [
+            x0 == None and x1 == None and not x > 0]): raise SolveError(
+        "Bracket values must be positive.")
+
+    # Guess the initial bracket.
+    du, down, up = math.log(2.0), x0 == None, x1 == None
+    if down and not up: ub = math.log(x1); ua = ub - du
+    elif up and not down: ua = math.log(x0); ub = ua + du
+    elif down and up: ua, ub = math.log(x/1.2), math.log(x*1.2)
+    else: ua, ub, down, up = math.log(min(x0, x1)), math.log(
+            max(x0, x1)), False, False
+    fa, fb = g(ua), g(ub)
+
+    # Expand the bracket if needed, keeping the last two values.
+    for itr in range(0, int(itrs)):
+        if fa*fb < 0 or not (down or up): break
+        stats.expansions += 1
+        if down and (not up or abs(fa) < abs(fb)):
+            ub, fb = ua, fa
+            ua = ua - du; fa = g(ua)
+        else:
+            ua, fa = ub, fb
+            ub = ub + du; fb = g(ub)
+        du *= 2.0
+    if not fa*fb < 0: raise SolveError(
+        "Could not find bracketing interval.")
+
+    # Apply Brent's method.
+    eps, uc, fc = sys.float_info.epsilon, ub, fb
+    d = e = ub - ua
+    for itr in range(0, int(itrs)):
+        stats.itrs += 1
+        if fb*fc > 0: uc, fc = ua, fa; d = e = ub - ua
+        if abs(fc) < abs(fb): ua, ub, uc, fa, fb, fc = ub, uc, ub, fb, fc, fb
+        tol1, um = 2.0*eps*abs(ub) + 0.5*tol, 0.5*(uc - ub)
+        if abs(um) <= tol1 or fb == 0.0: return math.exp(ub)
+        if abs(e) >= tol1 and abs(fa) > abs(fb):
+            s = fb/fa
+            if ua == uc: p, q = 2.0*um*s, 1.0 - s
+            else:
+                q, r = fa/fc, fb/fc
+                p = s*(2.0*um*q*(q - r) - (ub - ua)*(r - 1.0))
+                q = (q - 1.0)*(r - 1.0)*(s - 1.0)
+            if p > 0: q = -q
+            p = abs(p)
+            if 2.0*p < min(3.0*um*q - abs(tol1*q), abs(e*q)): e, d = d, p/q
+            else: d = e = um
+        else: d = e = um
+        ua, fa = ub, fb
+        ub += d if abs(d) > tol1 else math.copysign(tol1, um)
+        fb = g(ub)
+    raise SolveError("Could not find a solution.")
+
+###############################################################################
+def solve_many(f, x0s = None, x1s = None, xs = 1, tol = 1e-2, itrs = 100,
+               stats = None):
+    """
+    Solve the zeros of many independent problems at once, where each
+    problem, or lane, is solved as with 'solve'. The bracket finding
+    and Ridders' method are applied to all the lanes together, and a
+    lane is no longer evaluated once it has converged or failed. Each
+    lane takes the same steps, and so gives the same solution, as
+    'solve'. A tuple of the solutions and the errors is returned. The
+    solution of a failed lane is NaN, and its error is the exception
+    that 'solve' would raise, usually a 'SolveError', otherwise the
+    error is 'None'. If the NumPy module is not available, each lane
+    is solved with 'solve' in turn.
+
+    f:     function to solve, must take an array of x values and an
+           array of the corresponding lane indices, e.g. 'f(x, idxs)',
+           and return an array of the function values.
+    x0s:   optional lower bracket values, where NaN is not provided.
+    x1s:   optional upper bracket values, where NaN is not provided.
+    xs:    optional starting values for bracket finding.
+    tol:   relative tolerance required on x.
+    itrs:  maximum number of iterations.
+    stats: optional 'SolveStats' to add the counts of all the lanes to.
+    """
+    # Determine the number of lanes.
+    n = max([len(v) for v in (x0s, x1s, xs) if hasattr(v, "__len__")] + [0])
+    x0s = [float("nan")]*n if x0s is None else x0s
+    x1s = [float("nan")]*n if x1s is None else x1s
+    xs = [xs]*n if not hasattr(xs, "__len__") else xs
+    if not numpy:
+        sols, errs = [], []
+        for idx, (x0, x1, x) in enumerate(zip(x0s, x1s, xs)):
+            try: sols.append(solve(
+                lambda x, idx = idx: f([x], [idx])[0], None if x0 != x0
+                else x0, None if x1 != x1 else x1, x, tol, itrs,
+                stats = stats))
+            except (SolveError, ArithmeticError) as err:
+                sols.append(float("nan")); errs.append(err)
+            else: errs.append(None)
+        return sols, errs
+    x0s, x1s, xs = [numpy.array(v, dtype = numpy.float64).reshape(n)
+                    for v in (x0s, x1s, xs)]
+    stats = SolveStats() if stats == None else stats
+    stats.solves += n
+    def feval(x, idxs):
+        stats.evals += len(idxs)
+        return numpy.asarray(f(x, idxs), dtype = numpy.float64).reshape(
+            len(idxs))
+
+    # Guess the initial brackets.
+    sx, g0, g1 = 2.0, numpy.isnan(x0s), numpy.isnan(x1s)
+    lo, hi, both, given = g0 & ~g1, g1 & ~g0, g0 & g1, ~g0 & ~g1
+    x0s = numpy.where(lo, x1s/sx, numpy.where(both, xs*0.8, x0s))
+    x1s = numpy.where(hi, x0s*sx, numpy.where(both, xs*1.2, x1s))
+    lanes = numpy.arange(n)
+    f01 = feval(numpy.concatenate((x0s, x1s)), numpy.concatenate(
+        (lanes, lanes)))
+    f0s, f1s = f01[0:n], f01[n:]
+
+    # Expand the brackets if needed.
+    xmin, xmax, fmin, fmax = x0s.copy(), x1s.copy(), f0s.copy(), f1s.copy()
+    swap = fmin < fmax
+    xmin[swap], xmax[swap], fmin[swap], fmax[swap] = (
+        x1s[swap], x0s[swap], f1s[swap], f0s[swap])
+    for itr in range(0, int(itrs)):
+        expand = numpy.where(both, ~(fmin*fmax < 0), ~(f0s*f1s < 0)) & ~(
+            given)
+        if not expand.any(): break
+        stats.expansions += int(expand.sum())
+        i0, i1 = lanes[expand & (lo | both)], lanes[expand & (hi | both)]
+        x0s[i0], x1s[i1] = x0s[i0]/sx, x1s[i1]*sx
+        f01 = feval(numpy.concatenate((x0s[i0], x1s[i1])),
+                    numpy.concatenate((i0, i1)))
+        f0s[i0], f1s[i1] = f01[0:len(i0)], f01[len(i0):]
+        ib = i0[both[i0]]
+        for x, v in [(x0s, f0s), (x1s, f1s)]:
+            lt, gt = ib[v[ib] < fmin[ib]], ib[v[ib] > fmax[ib]]
+            xmin[lt], fmin[lt], xmax[gt], fmax[gt] = x[lt], v[lt], x[gt], v[gt]
+    x0s[both], x1s[both], f0s[both], f1s[both] = (
+        xmin[both], xmax[both], fmin[both], fmax[both])
+    swap = (both | given) & (x0s > x1s)
+    x0s[swap], x1s[swap], f0s[swap], f1s[swap] = (
+        x1s[swap], x0s[swap], f1s[swap], f0s[swap])
+    sols, errs = numpy.full(n, numpy.nan), [None]*n
+    for idx in lanes[~(f0s*f1s < 0)]: errs[idx] = SolveError(
+        "Could not find bracketing interval.")
+
+    # Apply Ridders' method. Lanes where 'solve' would fail with an
+    # arithmetic error are also stopped, with the same error.
+    active = f0s*f1s < 0
+    for itr in range(0, int(itrs)):
+        idxs = lanes[active]
+        if len(idxs) == 0: break
+        stats.itrs += len(idxs)
+        x0, x1, f0, f1 = x0s[idxs], x1s[idxs], f0s[idxs], f1s[idxs]
+        xm = (x0 + x1)/2.0
+        fm = feval(xm, idxs)
+        with numpy.errstate(all = "ignore"):
+            fm2 = fm**2
+            xn = xm + (xm - x0)*numpy.where(f0 < 0, -1.0, 1.0)*fm/numpy.sqrt(
+                fm2 - f0*f1)
+        fail = numpy.isinf(fm2) & numpy.isfinite(fm)
+        for idx in idxs[fail]: errs[idx] = OverflowError(
+            34, "Numerical result out of range")
+        active[idxs[fail]], ok = False, ~fail
+        idxs, x0, x1, f0, f1, xm, fm, xn = [
+            v[ok] for v in (idxs, x0, x1, f0, f1, xm, fm, xn)]
+        fn = feval(xn, idxs)
+        fail = (fn != 0.0) & (xn == 0.0)
+        for idx in idxs[fail]: errs[idx] = ZeroDivisionError(
+            "float division by zero")
+        with numpy.errstate(all = "ignore"):
+            done = ~fail & ((fn == 0.0) | (abs(x1 - x0)/xn < tol))
+        sols[idxs[done]], active[idxs[fail | done]] = xn[done], False
+        c0, c1 = fn*fm < 0, fn*f0 < 0
+        c1, c2 = ~c0 & c1, ~c0 & ~c1
+        x0s[idxs] = numpy.where(c0 | c2, xn, x0)
+        x1s[idxs] = numpy.where(c0, xm, numpy.where(c1, xn, x1))
+        f0s[idxs] = numpy.where(c0 | c2, fn, f0)
+        f1s[idxs] = numpy.where(c0, fm, numpy.where(c1, fn, f1))
+    for idx in lanes[active]: errs[idx] = SolveError(
+        "Could not find a solution.")
+    return sols, errs
+
 ###############################################################################
 class DatasetError(Exception):
     """
@@ -167,33 +612,94 @@ class Dataset:
     '()' operator. Within the dataset range linear interpolation is
     used, while outside the dataset range the nearest edge point is
     used. The dataset is assumed to be a regular grid but is not
-    required to have constant spacing.
+    required to have constant spacing. If the NumPy module is
+    available, the axes and values are stored as contiguous float64
+    arrays and the '()' operator also accepts arrays of points,
+    otherwise lists are used. Axes which are uniformly or
+    log-uniformly spaced are detected when the dataset is created, and
+    keys along these axes are then found arithmetically in constant
+    time.
+
+    Along with linear interpolation, cubic Hermite and monotone
+    piecewise cubic Hermite (PCHIP) interpolation can be used along
+    the final axis x_n-1, followed by linear interpolation across the
+    leading axes. The polynomial coefficients for each interval are
+    computed once, when first needed, and then reused.
+
+    Grids with missing points can instead be stored as ragged rows,
+    where each row is given by a point on the leading axes x_0, ...,
+    x_n-2 and holds only the points provided along the final axis
+    x_n-1, similar to a compressed sparse row matrix. Each row is then
+    interpolated along x_n-1 using only its own points, with the
+    nearest row edge used outside the row range, before interpolating
+    across the rows.
     
     axes: defining axes for the dataset.
     vals: dataset values.
+    offs: offsets of each row in the values for a ragged dataset,
+          otherwise 'None'.
+    cols: x_n-1 coordinate of each value for a ragged dataset.
     dim:  dimension of the dataset.
     len:  number of stored dataset values.
     """
     ###########################################################################
-    def __init__(self, name = None, vals = None):
+    def __init__(self, name = None, vals = None, axes = None,
+                 ragged = False, copy = True):
         """
         Initiate the dataset from a whitespace separated text file
         with the format 'x_0 x_1 ... x_n' for each line. The dataset
         is assumed to be a regular grid; any missing points are
-        initialized as 0.
+        initialized as 0. When reading from a file, a binary cache of
+        the dataset is used if valid, and otherwise written, see the
+        'cacheread' and 'cachewrite' functions.
 
-        name: name of the text file to read the dataset from.
-        vals: optional list of values, rather than a file.
+        name:   name of the text file to read the dataset from.
+        vals:   optional list of values, rather than a file, either as
+                rows 'x_0 x_1 ... x_n' or a 2D array of these rows.
+        axes:   optional list of sorted axes, in which case 'vals' is
+                the flat list of values on the grid defined by the axes.
+        ragged: if true, store the points read from a file or rows as
+                ragged rows rather than a regular grid.
+        copy:   if false, axes and values given as contiguous float64
+                arrays are stored without copying, and so changes to
+                either, e.g. by an in-place operator, are shared.
         """
-        import os.path, copy
-        self.vals, self.axes, dim = [], [[]], 0
+        self.vals, self.axes, dim, path, rows = [], [[]], 0, None, None
+        self.offs, self.cols, self.__spaces = None, None, None
+        self.__coefs = {}
+        kind = "RaggedDataset" if ragged else "Dataset"
+
+        # Set directly from the axes and flat values.
+        if axes != None:
+            self.axes = [array(axis) for axis in axes]
+            self.vals = array(vals)
+            if copy and numpy:
+                self.axes = [a.copy() if a is axis else a
+                             for a, axis in zip(self.axes, axes)]
+                if self.vals is vals: self.vals = self.vals.copy()
+            if len(self.vals) != prod([len(a) for a in self.axes]):
+                raise DatasetError(
+                    "Values have size %i, %i required." % (
+                        len(self.vals), prod([len(a) for a in self.axes])))
+            self.__spaces = self.__space()
+            return
 
         # Read from a file.
         if name != None:
-            try: data, vals = open(find(name)), []
+            path = find(name)
+            cache = cacheread(path, kind) if path else None
+            if cache:
+                self.axes, self.vals = cache[0][0:-1], cache[0][-1]
+                if ragged:
+                    self.axes, self.offs, self.cols = (self.axes[0:-2],
+                        self.axes[-2].astype(numpy.int64), self.axes[-1])
+                self.__spaces = self.__space()
+                return
+            try: data, vals = open(path), []
             except: raise DatasetError(
                 "Could not find the dataset '%s'." % name)
-            for idx, line in enumerate(data):
+            rows = table(data)
+            for idx, line in enumerate(data if rows is None else []):
                 line = line.split("#")[0].split()
                 if len(line) == 0: continue
                 if dim == 0:
@@ -209,8 +715,12 @@ class Dataset:
                     "Failed to read line %i." % (idx + 1))
             data.close()
         
+        # Read from an array of rows.
+        elif numpy and isinstance(vals, numpy.ndarray) and vals.ndim == 2 and (
+                vals.shape[1] > 1 and len(vals)): rows = vals
+
         # Read from a list of values.
-        elif vals:
+        elif vals is not None and len(vals):
             for idx, line in enumerate(vals):
                 if dim == 0:
                     self.axes = [set() for i in range(len(line) - 1)]
@@ -221,12 +731,62 @@ class Dataset:
                     "Failed to read line %i." % (idx + 1))
         else: return
 
+        # Find the axes and scatter the values from an array of rows.
+        if rows is not None:
+            dim = rows.shape[1] - 1
+            self.axes, keys = zip(*[numpy.unique(
+                col, return_inverse = True) for col in rows.T[0:-1]])
+            self.axes = [numpy.ascontiguousarray(a) for a in self.axes]
+            fkeys = numpy.ravel_multi_index(keys, [len(a) for a in self.axes])
+            if ragged: self.__ragged(fkeys, rows[:, -1])
+            else:
+                self.vals = numpy.zeros(prod([len(a) for a in self.axes]))
+                self.vals[fkeys] = rows[:, -1]
+
         # Sort the axes and allocate the values.
-        for idx, axis in enumerate(self.axes):
-            self.axes[idx] = sorted(list(axis))
-        self.vals = [0]*prod([len(a) for a in self.axes])
-        for i, val in enumerate(vals):
-            self[self.__fkey(val)] = val[-1]
+        else:
+            for idx, axis in enumerate(self.axes):
+                self.axes[idx] = sorted(list(axis))
+            if ragged: self.__ragged([self.__fkey(val) for val in vals],
+                                     [val[-1] for val in vals])
+            else:
+                self.vals = [0]*prod([len(a) for a in self.axes])
+                for i, val in enumerate(vals):
+                    self[self.__fkey(val)] = val[-1]
+            self.axes = [array(axis) for axis in self.axes]
+            self.vals = array(self.vals)
+        self.__spaces = self.__space()
+        if path and dim: cachewrite(path, kind, self.axes + (
+            [array(self.offs), self.cols] if ragged else []) + [self.vals])
+
+    ###########################################################################
+    def __ragged(self, fkeys, vals):
+        """
+        Store the values as ragged rows, given the flat keys of each
+        value on the full grid. If a key is repeated, the last value
+        is used.
+
+        fkeys: flat keys of the values on the full grid.
+        vals:  values to store.
+        """
+        import bisect
+        n = len(self.axes[-1])
+        rows = prod([len(a) for a in self.axes[0:-1]]) or 1
+        if numpy:
+            fkeys = numpy.asarray(fkeys)
+            order = numpy.argsort(fkeys, kind = "stable")
+            fkeys, vals = fkeys[order], numpy.asarray(vals)[order]
+            last = numpy.append(fkeys[1:] != fkeys[0:-1], True)
+            fkeys, self.vals = fkeys[last], array(vals[last])
+            self.offs = numpy.searchsorted(fkeys, numpy.arange(rows + 1)*n)
+            self.cols = array(numpy.asarray(self.axes[-1])[fkeys % n])
+        else:
+            pts = dict(zip(fkeys, vals))
+            fkeys = sorted(pts)
+            self.vals = [pts[fkey] for fkey in fkeys]
+            self.offs = [bisect.bisect_left(fkeys, r*n) for r in range(
+                rows + 1)]
+            self.cols = [float(self.axes[-1][fkey % n]) for fkey in fkeys]
 
     ###########################################################################
     def __call__(self, xs, method = 1):
@@ -234,26 +794,55 @@ class Dataset:
         Return the interpolated/extrapolated dataset x_n value, given
         the point x_0, ..., x_n-1.
 
-        xs:     point to interpolate, must be of length n-1.
-        method: interpolation method.
+        If the NumPy module is available, an array of points with
+        shape (N, n-1) can also be passed, or shape (N,) when n = 2,
+        and an array of the N interpolated values is returned.
+
+        xs:     point or array of points to interpolate, must be of
+                length n-1.
+        method: interpolation method, 0 for nearest neighbor, 1 for
+                linear, 2 for cubic Hermite with three point slopes,
+                and 3 for monotone piecewise cubic Hermite (PCHIP).
         """
+        if method not in (0, 1, 2, 3): raise DatasetError(
+            "Unknown interpolation method %r." % (method,))
+        if numpy and isinstance(xs, numpy.ndarray) and (
+                xs.ndim == 2 or (xs.ndim == 1 and self.dim() == 1)):
+            return self.__vcall(xs, method)
         try: xs[0]
         except: xs = (xs,)
         if self.dim() != len(xs): raise DatasetError(
             "Incorrect dimension %i, %i required." % (len(xs), self.dim()))
 
         # Nearest neighbor.
-        if method == 0: return self[self.__fkey(xs)]
+        ragged = self.offs is not None
+        if method == 0 and ragged:
+            return self.__row(self.__s2r(self.__skey(xs[0:-1])), xs[-1], 0)
+        elif method == 0: return float(self[self.__fkey(xs)])
+
+        # Linear interpolation for one dimension.
+        if len(xs) == 1 and method == 1 and not ragged:
+            (k0,), (k1,) = self.__skey(xs, True)
+            if k0 == k1: return float(self.vals[k0])
+            x, x0, x1 = xs[0], float(self.axes[0][k0]), float(self.axes[0][k1])
+            return (x1 - x)/(x1 - x0)*float(self.vals[k0]) + (x - x0)/(
+                x1 - x0)*float(self.vals[k1])
         
-        # Polynomial interpolation.
-        vals, bxs, ks = [], [], self.__skey(xs, True)
-        for k in range(2**self.dim()):
+        # Polynomial interpolation, first along the rows if ragged or
+        # for the cubic methods.
+        lead = xs[0:-1] if ragged or method > 1 else xs
+        vals, bxs, ks = [], [], self.__skey(lead if ragged else xs, True)
+        for k in range(2**len(lead)):
             bks = []
-            for d in range(self.dim()): bks.append(k % 2); k = (k - bks[-1])/2
+            for d in range(len(lead)): bks.append(k % 2); k = int(k/2)
             sks = [ks[bk][d] for d, bk in enumerate(bks)]
-            vals.append(self[self.__s2f(sks)])
+            if ragged: vals.append(self.__row(self.__s2r(sks), xs[-1], method))
+            elif method > 1: vals.append(self.__hermite(
+                self.__s2f(sks + [ks[0][-1]]), self.__s2f(sks + [ks[1][-1]]),
+                xs[-1], method))
+            else: vals.append(float(self[self.__s2f(sks)]))
             bxs.append(self.__s2x(sks))
-        for d, x in enumerate(xs):
+        for d, x in enumerate(lead):
             step = 2**(d + 1)
             for k in range(0, len(vals), step):
                 
@@ -264,35 +853,168 @@ class Dataset:
                 vals[k] = (x1 - x)/(x1 - x0)*val0 + (x - x0)/(x1 - x0)*val1
         return vals[0]
 
+    ###########################################################################
+    def __vcall(self, xs, method = 1):
+        """
+        Return the interpolated/extrapolated dataset x_n values, given
+        an array of N points x_0, ..., x_n-1. The interpolation is
+        performed for all points at once, but otherwise identically
+        to the '()' operator.
+
+        xs:     array of points to interpolate, of shape (N, n-1).
+        method: interpolation method.
+        """
+        xs = numpy.asarray(xs, dtype = numpy.float64).reshape(len(xs), -1)
+        if self.dim() != xs.shape[1]: raise DatasetError(
+            "Incorrect dimension %i, %i required." % (xs.shape[1], self.dim()))
+
+        # Nearest neighbor.
+        ragged = self.offs is not None
+        if method == 0 and ragged: return self.__row(self.__s2r(
+            self.__skey(xs.T[0:-1])), xs.T[-1], 0)
+        elif method == 0: return self.vals[self.__s2f(self.__skey(xs.T))]
+
+        # Polynomial interpolation, first along the rows if ragged or
+        # for the cubic methods.
+        lead = xs.T[0:-1] if ragged or method > 1 else xs.T
+        vals, (k0s, k1s) = [], self.__skey(lead if ragged else xs.T, True)
+        for k in range(2**len(lead)):
+            bks = []
+            for d in range(len(lead)): bks.append(k % 2); k = int(k/2)
+            sks = [(k1s if bk else k0s)[d] for d, bk in enumerate(bks)]
+            if ragged: vals.append(self.__row(
+                self.__s2r(sks), xs.T[-1], method))
+            elif method > 1: vals.append(self.__hermite(
+                self.__s2f(sks + [k0s[-1]]), self.__s2f(sks + [k1s[-1]]),
+                xs.T[-1], method))
+            else: vals.append(self.vals[self.__s2f(sks)])
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            for d, x in enumerate(lead):
+                step = 2**(d + 1)
+                x0, x1 = self.axes[d][k0s[d]], self.axes[d][k1s[d]]
+                for k in range(0, len(vals), step):
+                
+                    # Currently just linear interpolation.
+                    val0, val1 = vals[k], vals[k + int(step/2)]
+                    vals[k] = numpy.where(x0 == x1, val0, (x1 - x)/(
+                        x1 - x0)*val0 + (x - x0)/(x1 - x0)*val1)
+        return vals[0]
+
+    ###########################################################################
+    def bracket(self, xs):
+        """
+        Return the bracketing structured keys, (k0s, k1s), for a given
+        point x_0, x_1, ..., x_n-1. Within the dataset range each x_i
+        is bracketed as axes[i][k0s[i]] < x_i < axes[i][k1s[i]], while
+        k0s[i] = k1s[i] when x_i is a grid point or outside the range.
+
+        If the NumPy module is available, an array of points with
+        shape (N, n-1) can also be passed, or shape (N,) when n = 2,
+        and arrays of the N keys per axis are returned.
+
+        xs: point or array of points to bracket, must be of length n-1.
+        """
+        if numpy and isinstance(xs, numpy.ndarray) and (
+                xs.ndim == 2 or (xs.ndim == 1 and self.dim() == 1)):
+            xs = numpy.asarray(xs, dtype = numpy.float64).reshape(
+                len(xs), -1).T
+        else:
+            try: xs[0]
+            except: xs = (xs,)
+        if self.dim() != len(xs): raise DatasetError(
+            "Incorrect dimension %i, %i required." % (len(xs), self.dim()))
+        return self.__skey(xs, True)
+
+    ###########################################################################
+    def __space(self, tol = 0.1):
+        """
+        Return the spacing of each axis, used for constant time key
+        finding. The spacing of an axis is given by the tuple (log,
+        u_0, 1/h, x_0, x_n), where the axis points are u_0 + k*h if
+        'log' is false, or exp(u_0 + k*h) otherwise, and x_0 and x_n
+        are the first and last axis points. If an axis is not
+        uniformly or log-uniformly spaced, 'None' is given.
+
+        tol: maximum deviation of any axis point from the uniform
+             spacing, as a fraction of the step h.
+        """
+        spaces = []
+        for axis in self.axes:
+            space, n = None, len(axis)
+            for log in (False, True):
+                if n < 3 or (log and not axis[0] > 0): continue
+                f = math.log if log else float
+                x0, x1 = f(axis[0]), f(axis[-1])
+                h = (x1 - x0)/(n - 1)
+                if not h > 0: continue
+                if numpy: dxs = abs((numpy.log(axis) if log else axis) - (
+                        x0 + h*numpy.arange(n)))
+                else: dxs = [abs(f(x) - x0 - h*k) for k, x in enumerate(axis)]
+                if max(dxs) < tol*h:
+                    space = (log, x0, 1.0/h, float(axis[0]), float(axis[-1]))
+                    break
+            spaces.append(space)
+        return spaces
+
     ###########################################################################
     def __skey(self, xs, bk = False):
         """
         Find the structured key of the nearest neighbor for a given
-        point x_0, x_1, ..., x_n-1. Key finding is performed per axis
-        with a modified regula falsi method: if regula falsi fails to
-        find a new bracket, bisection is used to find a new bracket.
+        point x_0, x_1, ..., x_n-1. For uniformly or log-uniformly
+        spaced axes the key is estimated arithmetically and then
+        corrected, otherwise key finding is performed per axis with
+        bisection, requiring O(log n) comparisons. If each x_i is a
+        NumPy array, the keys for all the points are found at once and
+        arrays of keys are returned.
 
         xs: point to determine the key of the nearest neighbor.
         bk: if true, return the bracketing structured keys of the point.
         """
+        import bisect
         k0s, k1s = [], []
-        for x, axis in zip(xs, self.axes):
-            k, k0, k1 = 0, 0, len(axis) - 1
-            if x <= axis[k0]:   k1 = k0
-            elif x >= axis[k1]: k0 = k1
+        spaces = self.__spaces or [None]*len(self.axes)
+        for x, axis, space in zip(xs, self.axes, spaces):
+            n = len(axis)
+            if numpy and isinstance(x, numpy.ndarray):
+                if space:
+                    log, x0, r, first, last = space
+                    inner = (x > first) & (x < last)
+                    with numpy.errstate(invalid = "ignore", divide = "ignore"):
+                        k = ((numpy.log(x) if log else x) - x0)*r
+                    k = numpy.where(inner, k, 0).clip(0, n - 2).astype(int)
+                    k -= axis[k] > x
+                    k += axis[k + 1] <= x
+                    bad = inner & ((axis[k] > x) | (axis[k + 1] <= x))
+                    if bad.any(): k[bad] = numpy.searchsorted(
+                        axis, x[bad], "right") - 1
+                    k1 = numpy.where(
+                        inner, numpy.where(axis[k] == x, k, k + 1),
+                        numpy.where(x <= first, 0, n - 1))
+                    k0 = numpy.where(inner, k, k1)
+                else:
+                    k1 = numpy.searchsorted(axis, x).clip(0, n - 1)
+                    k0 = numpy.where((axis[k1] > x) & (k1 > 0), k1 - 1, k1)
+            elif space:
+                log, x0, r, first, last = space
+                if x <= first: k0 = k1 = 0
+                elif x >= last: k0 = k1 = n - 1
+                else:
+                    k = int(((math.log(x) if log else x) - x0)*r)
+                    k = min(max(k, 0), n - 2)
+                    while axis[k] > x: k -= 1
+                    while axis[k + 1] <= x: k += 1
+                    k0, k1 = (k, k) if axis[k] == x else (k, k + 1)
             else:
-                while k1 - k0 > 1:
-                    k = k0 + int(
-                        round((x - axis[k0])*(k1 - k0)/(axis[k1] - axis[k0])))
-                    if x == axis[k]: k0, k1 = k, k; break
-                    if k == k0 or k == k1: k = k0 + int((k1 - k0)/2)
-                    if x > axis[k]: k0 = k
-                    else: k1 = k
+                k1 = min(bisect.bisect_left(axis, x), n - 1)
+                k0 = k1 - 1 if k1 > 0 and axis[k1] > x else k1
             k0s.append(k0)
             k1s.append(k1)
         if bk: return (k0s, k1s)
+        elif numpy and len(xs) and isinstance(xs[0], numpy.ndarray):
+            return [numpy.where(abs(axis[k1] - x) < abs(axis[k0] - x), k1, k0)
+                    for x, axis, k0, k1 in zip(xs, self.axes, k0s, k1s)]
         else: return [k1 if abs(axis[k1] - x) < abs(axis[k0] - x) else k0
-                      for axis, k0, k1 in zip(self.axes, k0s, k1s)]
+                      for x, axis, k0, k1 in zip(xs, self.axes, k0s, k1s)]
 
     ###########################################################################
     def __fkey(self, xs, bk = False):
@@ -304,7 +1026,7 @@ class Dataset:
         bk: if true, return the bracketing flat keys of the point.
         """
         if bk: 
-            k0s, k1s = self.__skey(xs)
+            k0s, k1s = self.__skey(xs, True)
             return self.__s2f(k0s), self.__s2f(k1s)
         else: return self.__s2f(self.__skey(xs))
 
@@ -320,6 +1042,191 @@ class Dataset:
             f += c*s; c *= len(axis)
         return f
 
+    ###########################################################################
+    def __s2r(self, skey):
+        """
+        Transform a structured key of the leading axes x_0, ..., x_n-2
+        to the row index of a ragged dataset.
+
+        skey: structured key to transform.
+        """
+        r, c = 0, 1
+        for s, axis in zip(reversed(skey), reversed(self.axes[0:-1])):
+            r += c*s; c *= len(axis)
+        return r
+
+    ###########################################################################
+    def __row(self, rs, x, method = 1):
+        """
+        Return the value of a row of a ragged dataset, interpolated at
+        x_n-1, or the nearest row edge value outside the row range. An
+        empty row has the value 0. If the NumPy module is available,
+        arrays of row indices and x_n-1 can also be passed.
+
+        rs:     row index.
+        x:      value of x_n-1 to interpolate the row at.
+        method: interpolation method.
+        """
+        import bisect
+        offs, cols, vals = self.offs, self.cols, self.vals
+
+        # Scalar row.
+        if not (numpy and isinstance(x, numpy.ndarray)):
+            o0, o1 = int(offs[rs]), int(offs[rs + 1])
+            if o0 == o1: return 0.0
+            k = bisect.bisect_left(cols, x, o0, o1)
+            if k == o1: return float(vals[k - 1])
+            if k == o0 or cols[k] == x: return float(vals[k])
+            x0, x1 = float(cols[k - 1]), float(cols[k])
+            if method == 0: return float(
+                vals[k if abs(x1 - x) < abs(x0 - x) else k - 1])
+            if method > 1: return self.__hermite(k - 1, k, x, method)
+            return (x1 - x)/(x1 - x0)*float(vals[k - 1]) + (x - x0)/(
+                x1 - x0)*float(vals[k])
+
+        # Array of rows, bisected per row.
+        rs = numpy.broadcast_to(rs, x.shape)
+        o0, o1, n = offs[rs], offs[rs + 1], len(cols)
+        lo, hi = o0, o1
+        while (lo < hi).any():
+            mid = (lo + hi)//2
+            less = (lo < hi) & (cols[mid.clip(0, n - 1)] < x)
+            lo, hi = numpy.where(less, mid + 1, lo), numpy.where(
+                (lo < hi) & ~less, mid, hi)
+        k1, k0 = lo.clip(0, n - 1), (lo - 1).clip(0, n - 1)
+        x0, x1, val0, val1 = cols[k0], cols[k1], vals[k0], vals[k1]
+        with numpy.errstate(divide = "ignore", invalid = "ignore"):
+            if method == 0: val = numpy.where(
+                abs(x1 - x) < abs(x0 - x), val1, val0)
+            elif method > 1: val = self.__hermite(k0, k1, x, method)
+            else: val = (x1 - x)/(x1 - x0)*val0 + (x - x0)/(x1 - x0)*val1
+        val = numpy.where((lo == o0) | (x1 == x), val1, val)
+        val = numpy.where(lo == o1, vals[(o1 - 1).clip(0, n - 1)], val)
+        return numpy.where(o0 == o1, 0.0, val)
+
+    ###########################################################################
+    def __hermite(self, k0s, k1s, x, method):
+        """
+        Return the cubic Hermite interpolation along the final axis
+        x_n-1 between the flat keys k0s and k1s, which are either
+        adjacent along the final axis, or equal, in which case the
+        value for the key is returned. If the NumPy module is
+        available, arrays of keys and x_n-1 can also be passed.
+
+        k0s:    flat key of the lower point.
+        k1s:    flat key of the upper point.
+        x:      value of x_n-1 to interpolate at.
+        method: interpolation method, 2 for three point slopes and 3
+                for PCHIP.
+        """
+        c1s, c2s, c3s = self.__hermites(method)
+        t = x - (self.cols[k0s] if self.offs is not None else
+                 self.axes[-1][k0s % len(self.axes[-1])])
+        if not (numpy and isinstance(k0s, numpy.ndarray)):
+            if k0s == k1s: return float(self.vals[k0s])
+            return float(self.vals[k0s] + t*(
+                c1s[k0s] + t*(c2s[k0s] + t*c3s[k0s])))
+        return numpy.where(k0s == k1s, self.vals[k0s], self.vals[k0s] + t*(
+            c1s[k0s] + t*(c2s[k0s] + t*c3s[k0s])))
+
+    ###########################################################################
+    def __hermites(self, method):
+        """
+        Return the coefficients (c1s, c2s, c3s) of the cubic Hermite
+        polynomials v_k + c1 t + c2 t^2 + c3 t^3, with t = x - x_k,
+        for the interval along the final axis which starts at each
+        value v_k. The coefficients are computed on the first call
+        and then reused. The slope at each interior point is given by
+        the three point formula for method 2, and by the weighted
+        harmonic mean of the secants, which preserves monotonicity,
+        for method 3 (PCHIP). Slopes at the row ends use the one-sided
+        three point formula, limited for PCHIP.
+
+        method: interpolation method, 2 or 3.
+        """
+        if method in self.__coefs: return self.__coefs[method]
+        pchip = method == 3
+
+        # Row ends and coordinates for each value.
+        if self.offs is not None:
+            xs, offs = self.cols, self.offs
+        else:
+            n = len(self.axes[-1])
+            offs = range(0, len(self.vals) + 1, n)
+            xs = numpy.tile(self.axes[-1], len(offs) - 1) if numpy else [
+                x for o in offs[1:] for x in self.axes[-1]]
+
+        # Vectorized over all the rows at once.
+        if numpy:
+            vs, size = self.vals, len(self.vals)
+            first, last = numpy.zeros((2, size + 2), dtype = bool)
+            offs = numpy.asarray(offs)
+            first[offs[0:-1][offs[0:-1] < offs[1:]]] = True
+            last[offs[1:][offs[0:-1] < offs[1:]] - 1] = True
+            first, last = first[0:size], last[0:size]
+            h = numpy.append(numpy.diff(xs), 1.0)
+            s = numpy.append(numpy.diff(vs), 0.0)
+            h[last], s[last] = 1.0, 0.0
+            s /= h
+            hm, sm = numpy.roll(h, 1), numpy.roll(s, 1)
+            with numpy.errstate(divide = "ignore", invalid = "ignore"):
+
+                # Interior slopes.
+                if pchip:
+                    w1, w2 = 2*h + hm, h + 2*hm
+                    d = numpy.where(sm*s > 0, (w1 + w2)/(w1/sm + w2/s), 0.0)
+                else: d = (hm*s + h*sm)/(hm + h)
+
+                # Slopes at the row ends.
+                for end, h0, s0, h1, s1, more in [
+                        (first, h, s, numpy.roll(h, -1), numpy.roll(s, -1),
+                         ~numpy.roll(last, -1)),
+                        (last, hm, sm, numpy.roll(h, 2), numpy.roll(s, 2),
+                         ~numpy.roll(first, 1))]:
+                    e = ((2*h0 + h1)*s0 - h0*s1)/(h0 + h1)
+                    if pchip:
+                        e = numpy.where(numpy.sign(e) != numpy.sign(s0), 0.0,
+                                        e)
+                        e = numpy.where((numpy.sign(s0) != numpy.sign(s1)) &
+                                        (abs(e) > 3*abs(s0)), 3*s0, e)
+                    d = numpy.where(end, numpy.where(more, e, s0), d)
+                d[first & last] = 0.0
+                dn = numpy.roll(d, -1)
+                coefs = (d, (3*s - 2*d - dn)/h, (d + dn - 2*s)/h**2)
+            coefs = tuple(numpy.where(last, 0.0, c) for c in coefs)
+
+        # Row by row.
+        else:
+            coefs, sign = ([], [], []), lambda v: (v > 0) - (v < 0)
+            for o0, o1 in zip(offs[0:-1], offs[1:]):
+                x, v = xs[o0:o1], self.vals[o0:o1]
+                h = [x1 - x0 for x0, x1 in zip(x[0:-1], x[1:])]
+                s = [(v1 - v0)/dx for v0, v1, dx in zip(v[0:-1], v[1:], h)]
+                d = [0.0]*len(x)
+                for k in range(1, len(x) - 1):
+                    w1, w2 = 2*h[k] + h[k - 1], h[k] + 2*h[k - 1]
+                    if not pchip: d[k] = (h[k - 1]*s[k] + h[k]*s[k - 1])/(
+                        h[k - 1] + h[k])
+                    elif s[k - 1]*s[k] > 0:
+                        d[k] = (w1 + w2)/(w1/s[k - 1] + w2/s[k])
+                for k, k0, k1 in [(0, 0, 1), (len(x) - 1, -1, -2)]:
+                    if len(x) < 2: continue
+                    h0, s0 = h[k0], s[k0]
+                    if len(x) < 3: d[k] = s0; continue
+                    h1, s1 = h[k1], s[k1]
+                    e = ((2*h0 + h1)*s0 - h0*s1)/(h0 + h1)
+                    if pchip and sign(e) != sign(s0): e = 0.0
+                    elif pchip and sign(s0) != sign(s1) and abs(e) > 3*abs(
+                        s0): e = 3*s0
+                    d[k] = e
+                for k in range(len(x)):
+                    if k == len(x) - 1: c = (0.0, 0.0, 0.0)
+                    else: c = (d[k], (3*s[k] - 2*d[k] - d[k + 1])/h[k],
+                               (d[k] + d[k + 1] - 2*s[k])/h[k]**2)
+                    for cs, ci in zip(coefs, c): cs.append(ci)
+        self.__coefs[method] = coefs
+        return coefs
+
     ###########################################################################
     def __f2s(self, fkey):
         """
@@ -340,7 +1247,7 @@ class Dataset:
 
         skey: structured key to transform.
         """
-        return [self.axes[i][j] for i, j in enumerate(skey)]
+        return [float(self.axes[i][j]) for i, j in enumerate(skey)]
 
     ###########################################################################
     def __f2x(self, fkey):
@@ -350,50 +1257,81 @@ class Dataset:
 
         fkey: flat key to transform.
         """
-        return self.__s2x(self.__f2s(fkey))
+        import bisect
+        if self.offs is None: return self.__s2x(self.__f2s(fkey))
+        s, r = [], bisect.bisect_right(self.offs, fkey) - 1
+        for axis in reversed(self.axes[0:-1]):
+            s.append(r % len(axis)); r = int(r/len(axis))
+        return self.__s2x(reversed(s)) + [float(self.cols[fkey])]
+
+    ###########################################################################
+    def __onto(self, axes):
+        """
+        Return the dataset values on the grid defined by a list of
+        axes, which must contain the dataset axes. If the axes are
+        those of the dataset, the values are returned without copying.
+
+        axes: list of sorted axes defining the grid.
+        """
+        if self.offs is None and all(
+                [len(x) == len(y) for x, y in zip(self.axes, axes)]):
+            return self.vals
+        if numpy:
+            xs = numpy.stack(numpy.meshgrid(*axes, indexing = "ij"), -1)
+            return self.__vcall(xs.reshape(-1, len(axes)))
+        return [self(xs) for xs in itertools.product(*axes)]
 
     ###########################################################################
-    def __opr(self, o, a, b):
+    def __opr(self, o, a, b, io = None):
         """
         Internal method used to apply an operator of the form 
-        'c = a o b'.
+        'c = a o b'. When both objects are of type 'Dataset', each is
+        interpolated once onto the union of their grids. When NumPy is
+        available, the operator is applied to all values at once. The
+        result has its own list of axes, but the arrays of the axes are
+        shared with the operands rather than copied. The result of
+        combining a ragged dataset with another dataset is a regular
+        dataset.
 
-        o: operator which can be called as o(a, b).
-        a: left-hand value of the operator.
-        b: right-hand value of the operator.
+        o:  operator which can be called as o(a, b).
+        a:  left-hand value of the operator.
+        b:  right-hand value of the operator.
+        io: optional in-place operator, e.g. 'operator.iadd', in which
+            case 'a' is this dataset which is updated as 'a o= b'.
         """
-        import copy
-        c = Dataset()
+        c = self if io else Dataset()
 
         # Both objects are of type 'Dataset'.
-        if type(a) == type(self) and type(b) == type(self):
+        if isinstance(a, Dataset) and isinstance(b, Dataset):
             if a.dim() != b.dim(): raise DatasetError(
                 "Incompatible dimensions %i and %i."  % (a.dim(), b.dim()))
-            asub, bsub = True, True
-            for aaxis, baxis in zip(a.axes, b.axes):
-                c.axes.append(sorted(list(set(aaxis) | set(baxis))))
-                asub &= len(baxis) == len(c.axes[-1])
-                bsub &= len(aaxis) == len(c.axes[-1])
-            if asub and bsub:
-                for fkey in range(len(c)):
-                    c[fkey] = o(a[fkey], b[fkey])
-            elif asub:
-                for fkey in range(len(c)): 
-                    c[fkey] = o(a(c.__f2x(fkey)), b[fkey])
-            elif bsub:
-                for fkey in range(len(c)): 
-                    c[fkey] = o(a[fkey], b(c.__f2x(fkey)))
-            else:
-                for fkey in range(len(c)):
-                    xs = c.__f2x(fkey); c[fkey] = o(a(xs), b(xs))
+            axes = [numpy.union1d(x, y) if numpy else sorted(set(x) | set(y))
+                    for x, y in zip(a.axes, b.axes)]
+            avals, bvals, offs = a.__onto(axes), b.__onto(axes), None
+            if avals is a.vals: axes, spaces = a.axes, a.__spaces
+            elif bvals is b.vals: axes, spaces = b.axes, b.__spaces
+            else: axes, spaces = [array(axis) for axis in axes], None
 
         # One object is of type 'Dataset'.
-        elif type(a) == type(self):
-            c = copy.deepcopy(a)
-            for fkey, val in enumerate(c.vals): c[fkey] = o(val, b)
-        elif type(b) == type(self):
-            c = copy.deepcopy(b)
-            for fkey, val in enumerate(c.vals): c[fkey] = o(val, a)
+        elif isinstance(a, Dataset):
+            axes, spaces, avals, bvals = a.axes, a.__spaces, a.vals, b
+            offs, cols = a.offs, a.cols
+        elif isinstance(b, Dataset):
+            axes, spaces, avals, bvals = b.axes, b.__spaces, a, b.vals
+            offs, cols = b.offs, b.cols
+        else: return NotImplemented
+
+        # Apply the operator.
+        if numpy: vals = (io or o)(avals, bvals)
+        elif not isinstance(avals, list): vals = [o(avals, y) for y in bvals]
+        elif not isinstance(bvals, list): vals = [o(x, bvals) for x in avals]
+        else: vals = [o(x, y) for x, y in zip(avals, bvals)]
+        if not (io and avals is self.vals): c.vals = vals
+        elif vals is not self.vals: self.vals[:] = vals
+        c.axes, c.offs = list(axes), offs
+        c.cols = cols if offs is not None else None
+        c.__spaces = spaces if spaces != None else c.__space()
+        c.__coefs = {}
         return c
 
     ###########################################################################
@@ -404,22 +1342,152 @@ class Dataset:
         return len(self.axes)
 
     ###########################################################################
+    def view(self, axis, key):
+        """
+        Return the dataset of dimension n-1 given by fixing an axis at
+        one of its points. If the NumPy module is available, the
+        values of the returned dataset are a view of the values of
+        this dataset rather than a copy, whenever the memory layout
+        allows, and so changes to either are shared, including by
+        in-place operators, e.g. '+='. Similarly, a dataset created
+        with 'copy = False' shares the arrays it was created from.
+        Only the first axis of a ragged dataset can be fixed.
+
+        axis: index of the axis to fix.
+        key:  index of the point on the axis to fix the axis at.
+        """
+        if self.dim() < 2: raise DatasetError(
+            "Cannot view a dataset of dimension %i." % self.dim())
+        if not 0 <= axis < self.dim(): raise DatasetError(
+            "Axis %i is not in the range [0, %i)." % (axis, self.dim()))
+        n = len(self.axes[axis])
+        if not -n <= key < n: raise DatasetError(
+            "Key %i is not valid for axis %i of size %i." % (key, axis, n))
+        key, c = key % n, Dataset()
+        c.axes = self.axes[0:axis] + self.axes[axis + 1:]
+
+        # Ragged dataset, where each key of the first axis is a block
+        # of contiguous rows.
+        if self.offs is not None:
+            if axis != 0: raise DatasetError(
+                "Only the first axis of a ragged dataset can be fixed.")
+            rows = prod([len(a) for a in self.axes[1:-1]]) or 1
+            offs = self.offs[key*rows:(key + 1)*rows + 1]
+            c.vals = self.vals[offs[0]:offs[-1]]
+            if self.dim() == 2: c.axes = [self.cols[offs[0]:offs[-1]]]
+            else:
+                c.cols = self.cols[offs[0]:offs[-1]]
+                c.offs = [o - offs[0] for o in offs] if not numpy else (
+                    offs - offs[0])
+            c.__spaces = c.__space()
+            return c
+
+        # Regular dataset.
+        outer = prod([len(a) for a in self.axes[0:axis]]) or 1
+        inner = prod([len(a) for a in self.axes[axis + 1:]]) or 1
+        if numpy: c.vals = self.vals.reshape(outer, n, inner)[
+            :, key, :].reshape(-1)
+        else: c.vals = [self.vals[(o*n + key)*inner + i]
+                        for o in range(outer) for i in range(inner)]
+        if self.__spaces: c.__spaces = (
+            self.__spaces[0:axis] + self.__spaces[axis + 1:])
+        return c
+
+    ###########################################################################
+    def rows(self):
+        """
+        Iterate over the rows of the dataset along the final axis,
+        yielding for each point x_0, ..., x_n-2 of the leading axes
+        the tuple (xs, axis, vals). Here 'xs' is the list of leading
+        coordinates, 'axis' the x_n-1 points of the row, and 'vals'
+        the values of the row. If the NumPy module is available, the
+        row axis and values are views rather than copies.
+        """
+        n = len(self.axes[-1])
+        for r, xs in enumerate(itertools.product(*self.axes[0:-1])):
+            xs = [float(x) for x in xs]
+            if self.offs is None:
+                yield xs, self.axes[-1], self.vals[r*n:(r + 1)*n]
+            else:
+                o0, o1 = self.offs[r], self.offs[r + 1]
+                yield xs, self.cols[o0:o1], self.vals[o0:o1]
+
+    ###########################################################################
+    def compress(self, rtol, atol = 0):
+        """
+        Return a compressed copy of the dataset, where grid points are
+        removed if their values are reproduced within tolerance by
+        linear interpolation of the neighboring points, see 'thin'.
+        For a regular dataset each axis is thinned in turn, removing
+        whole slices of the grid, and so the errors along each axis
+        can accumulate. For a ragged dataset each row is thinned
+        separately along the final axis.
+
+        rtol: relative tolerance.
+        atol: absolute tolerance.
+        """
+        # Ragged dataset.
+        if self.offs is not None:
+            rows = []
+            for xs, axis, vals in self.rows():
+                keep = thin(axis, [[v] for v in vals], rtol, atol)
+                rows += [xs + [float(axis[k]), float(vals[k])] for k in keep]
+            return Dataset(vals = rows, ragged = True)
 
-    def __setitem__(self, fkey, val): self.vals[fkey] = val
+        # Regular dataset.
+        axes, vals = list(self.axes), self.vals
+        for d in range(self.dim()):
+            n = len(axes[d])
+            outer = prod([len(a) for a in axes[0:d]]) or 1
+            inner = prod([len(a) for a in axes[d + 1:]]) or 1
+            if numpy:
+                vals = vals.reshape(outer, n, inner)
+                keep = thin(axes[d], vals.transpose(1, 0, 2).reshape(n, -1),
+                            rtol, atol)
+                vals = vals[:, keep, :].reshape(-1)
+            else:
+                keep = thin(axes[d], [[vals[(o*n + k)*inner + i]
+                    for o in range(outer) for i in range(inner)]
+                    for k in range(n)], rtol, atol)
+                vals = [vals[(o*n + k)*inner + i] for o in range(outer)
+                        for k in keep for i in range(inner)]
+            axes[d] = [axes[d][k] for k in keep]
+        return Dataset(axes = axes, vals = vals)
+
+    ###########################################################################
+    def __setitem__(self, fkey, val):
+        self.vals[fkey] = val
+        if self.__coefs: self.__coefs = {}
     def __getitem__(self, fkey): return self.vals[fkey]
     def __len__ (self): return len(self.vals)
     def __add__ (self, b): return self.__opr(operator.add, self, b)
     def __sub__ (self, b): return self.__opr(operator.sub, self, b)
     def __mul__ (self, b): return self.__opr(operator.mul, self, b)
     def __div__ (self, b): return self.__opr(operator.div, self, b)
+    def __truediv__ (self, b): return self.__opr(operator.truediv, self, b)
     def __mod__ (self, b): return self.__opr(operator.mod, self, b)
     def __pow__ (self, b): return self.__opr(operator.pow, self, b)
-    def __radd__(self, b): return self.__opr(operator.add, self, b)
-    def __rsub__(self, b): return self.__opr(operator.sub, self, b)
-    def __rmul__(self, b): return self.__opr(operator.mul, self, b)
-    def __rdiv__(self, b): return self.__opr(operator.div, self, b)
-    def __rmod__(self, b): return self.__opr(operator.mod, self, b)
-    def __rpow__(self, b): return self.__opr(operator.pow, self, b)
+    def __radd__(self, b): return self.__opr(operator.add, b, self)
+    def __rsub__(self, b): return self.__opr(operator.sub, b, self)
+    def __rmul__(self, b): return self.__opr(operator.mul, b, self)
+    def __rdiv__(self, b): return self.__opr(operator.div, b, self)
+    def __rtruediv__(self, b): return self.__opr(operator.truediv, b, self)
+    def __rmod__(self, b): return self.__opr(operator.mod, b, self)
+    def __rpow__(self, b): return self.__opr(operator.pow, b, self)
+    def __iadd__(self, b):
+        return self.__opr(operator.add, self, b, operator.iadd)
+    def __isub__(self, b):
+        return self.__opr(operator.sub, self, b, operator.isub)
+    def __imul__(self, b):
+        return self.__opr(operator.mul, self, b, operator.imul)
+    def __idiv__(self, b):
+        return self.__opr(operator.div, self, b, operator.idiv)
+    def __itruediv__(self, b):
+        return self.__opr(operator.truediv, self, b, operator.itruediv)
+    def __imod__(self, b):
+        return self.__opr(operator.mod, self, b, operator.imod)
+    def __ipow__(self, b):
+        return self.__opr(operator.pow, self, b, operator.ipow)
 
 ###############################################################################
 class DatasetsError(Exception):
@@ -434,105 +1502,312 @@ class Datasets(collections.OrderedDict):
     Loads multiple 2-dimensional 'Dataset's from a single file, all as
     a function of the first column. The first row is read as labels
     for the columns. The 'Datasets' object acts as an ordered
-    dictionary for the individual datasets.
+    dictionary for the individual datasets. When read from a file, the
+    datasets share a single axis and their values are stored as the
+    rows of a single matrix, where each 'Dataset' holds a view of its
+    row if the NumPy module is available. All the datasets can then be
+    interpolated at once with the '()' operator.
+
+    axis: shared axis of the datasets, or 'None' if not read from a file.
+    vals: matrix of values with a row for each dataset, or 'None'.
     """
     ###########################################################################
     def __init__(self, name = None):
         """
-        Load the datasets for a given file.
+        Load the datasets for a given file. A binary cache of the
+        datasets is used if valid, and otherwise written, see the
+        'cacheread' and 'cachewrite' functions. Files with the
+        extensions '.npz', '.parquet', or '.feather', written with
+        'write', are read directly.
 
-        name: name of the text file to read the datasets from.
+        name: name of the file to read the datasets from.
         """
         super(Datasets, self).__init__()
+        self.axis, self.vals, self.__views = None, None, []
         if name == None: return
-        try: data = open(find(name))
+        path = find(name)
+        if path and os.path.splitext(path)[1].lower() in (
+                ".npz", ".parquet", ".feather"):
+            self.__read(path)
+            return
+        cache = cacheread(path, "Datasets") if path else None
+        if cache and len(cache[0]) == 2:
+            self.__share(cache[1], cache[0][0], cache[0][1].reshape(
+                len(cache[1]), -1))
+            return
+        try: data = open(path)
         except: raise DatasetsError(
             "Could not find the dataset '%s'." % name)
 
         # Read from a file.
         keys = data.readline().replace("#", "").split()[1:]
-        dats = [[] for key in keys]
-        for idx, line in enumerate(data):
+        rows = table(data, len(keys) + 1)
+        if rows is None: rows = []
+        for idx, line in enumerate(data if len(rows) == 0 else []):
             line = line.split("#")[0].split()
             if len(line) == 0: continue
             if len(line) != len(keys) + 1: raise DatasetsError(
                 "Line %i has size %i, %i required." 
                 % (idx + 1, len(line), len(keys)))
-            try:
-                var = float(line[0])
-                for dat, val in zip(dats, line[1:]):
-                    dat.append([var, float(val)])
+            try: rows.append([float(val) for val in line])
             except: raise DatasetsError(
                 "Failed to read line %i." % (idx + 1))
         data.close()
+        if len(rows) == 0:
+            for key in keys: self[key] = Dataset()
+            return
 
-        # Create the datasets.
-        for key, vals in zip(keys, dats): self[key] = Dataset(vals = vals)
+        # Create the shared axis and matrix of values.
+        if numpy:
+            rows = numpy.asarray(rows, dtype = numpy.float64)
+            axis, idxs = numpy.unique(rows[:, 0], return_inverse = True)
+            vals = numpy.zeros((len(keys), len(axis)))
+            vals[:, idxs] = rows[:, 1:].T
+        else:
+            axis = sorted(set(row[0] for row in rows))
+            idxs = dict((x, idx) for idx, x in enumerate(axis))
+            vals = [[0.0]*len(axis) for key in keys]
+            for row in rows:
+                for val, v in zip(vals, row[1:]): val[idxs[row[0]]] = v
+        self.__share(keys, axis, vals)
+        if numpy and len(keys): cachewrite(
+            path, "Datasets", [self.axis, self.vals.reshape(-1)], keys)
+
+    ###########################################################################
+    def __read(self, path):
+        """
+        Read the datasets from a binary file written with 'write'. The
+        NumPy module is required, and for Parquet or Feather files the
+        'pyarrow' module.
+
+        path: path of the binary file.
+        """
+        if not numpy: raise DatasetsError(
+            "The NumPy module is required to read '%s'." % path)
+        try:
+            if path.lower().endswith(".npz"):
+                with numpy.load(path, allow_pickle = False) as data:
+                    keys, axis, vals = (
+                        data["keys"].tolist(), data["axis"], data["vals"])
+            else:
+                import pyarrow.parquet, pyarrow.feather
+                data = (pyarrow.parquet.read_table if path.lower().endswith(
+                    ".parquet") else pyarrow.feather.read_table)(path)
+                keys = data.column_names[1:]
+                axis, vals = data.column(0).to_numpy(), numpy.array([
+                    data.column(key).to_numpy() for key in keys])
+        except: raise DatasetsError("Failed to read '%s'." % path)
+        self.__share(keys, axis, vals.reshape(len(keys), len(axis)))
+
+    ###########################################################################
+    def __share(self, keys, axis, vals):
+        """
+        Create the datasets from a shared axis and a matrix of values.
+
+        keys: labels of the datasets.
+        axis: shared axis of the datasets.
+        vals: matrix of values, with a row for each key.
+        """
+        self.axis = array(axis)
+        self.vals = numpy.ascontiguousarray(vals, dtype = numpy.float64) if (
+            numpy) else [array(val) for val in vals]
+        for key, val in zip(keys, self.vals):
+            self[key] = Dataset(axes = [self.axis], vals = val,
+                                copy = False)
+        self.__views = [self[key].vals for key in keys]
+        if not numpy: self.vals = self.__views
+
+    ###########################################################################
+    def __call__(self, x, method = 1):
+        """
+        Return the interpolated/extrapolated values of all the datasets
+        for a given x, in the order of the keys. If the datasets share
+        an axis, the key for x is found once and the values of all the
+        datasets are interpolated together, otherwise each dataset is
+        interpolated in turn. A list of values is returned, or if an
+        array of N values of x is passed, an array of shape (k, N) for
+        k datasets.
+
+        x:      value to interpolate.
+        method: interpolation method, see 'Dataset'.
+        """
+        batch = numpy and isinstance(x, numpy.ndarray)
+        shared = self.vals is not None and method in (0, 1) and len(
+            self) == len(self.__views) and all([
+                self[key].vals is view and self[key].axes[0] is self.axis
+                for key, view in zip(self, self.__views)])
+        if not shared:
+            vals = [self[key](x, method) for key in self]
+            return numpy.array(vals) if batch else vals
+
+        # Find the key once for all the datasets.
+        axis, vals = self.axis, self.vals
+        (k0,), (k1,) = self[next(iter(self))].bracket(x)
+        if batch:
+            x0, x1 = axis[k0], axis[k1]
+            if method == 0: return vals[:, numpy.where(
+                abs(x1 - x) < abs(x0 - x), k1, k0)]
+            with numpy.errstate(divide = "ignore", invalid = "ignore"):
+                return numpy.where(k0 == k1, vals[:, k0], (x1 - x)/(
+                    x1 - x0)*vals[:, k0] + (x - x0)/(x1 - x0)*vals[:, k1])
+        x0, x1 = float(axis[k0]), float(axis[k1])
+        if method == 0: k0 = k1 if abs(x1 - x) < abs(x0 - x) else k0
+        if method == 0 or k0 == k1:
+            return vals[:, k0].tolist() if numpy else [
+                float(val[k0]) for val in vals]
+        if numpy: return ((x1 - x)/(x1 - x0)*vals[:, k0] + (x - x0)/(
+            x1 - x0)*vals[:, k1]).tolist()
+        return [(x1 - x)/(x1 - x0)*float(val[k0]) + (x - x0)/(
+            x1 - x0)*float(val[k1]) for val in vals]
+
+    ###########################################################################
+    def compress(self, rtol, atol = 0):
+        """
+        Return a compressed copy of the datasets, where points are
+        removed if the values of every dataset are reproduced within
+        tolerance by linear interpolation of the neighboring points,
+        see 'thin'. The datasets must share the same axis.
+
+        rtol: relative tolerance.
+        atol: absolute tolerance.
+        """
+        keys, c = list(self), Datasets()
+        if not keys: return c
+        axis = self[keys[0]].axes[0]
+        keep = thin(axis, [list(vs) for vs in zip(
+            *[self[key].vals for key in keys])], rtol, atol)
+        c.__share(keys, [axis[k] for k in keep], [
+            [self[key].vals[k] for k in keep] for key in keys])
+        return c
 
     ###########################################################################
     def write(self, txt, xlabel = "mass", format = "%11.4e"):
         """
-        Write out the datasets to a text file.
+        Write out the datasets to a file. By default a text file is
+        written, with a column for the x-values followed by a column
+        for each dataset. If the name ends with '.npz' a compressed
+        NumPy archive is written instead, and if it ends with
+        '.parquet' or '.feather' a columnar table, which requires the
+        'pyarrow' module. All these files can be read back with
+        'Datasets'. The datasets must share the same axis.
 
-        txt:    the name of the text file to write out.
+        txt:    the name of the file to write out.
         xlabel: label to give the first column, i.e. the x-values.
         format: optionally, the format to write out the values.
         """
-        txt = open(txt, "w")
         keys = [key for key in self]
+        axis = self[keys[0]].axes[0]
+        vals = [self[key].vals for key in keys]
+        ext = os.path.splitext(txt)[1].lower()
+
+        # Write a binary file.
+        if ext in (".npz", ".parquet", ".feather"):
+            if not numpy: raise DatasetsError(
+                "The NumPy module is required to write '%s'." % txt)
+            axis, vals = numpy.asarray(axis, dtype = numpy.float64), (
+                numpy.array(vals, dtype = numpy.float64))
+            if ext == ".npz":
+                numpy.savez_compressed(txt, keys = numpy.array(keys, dtype = (
+                    numpy.str_)), axis = axis, vals = vals)
+                return
+            try: import pyarrow, pyarrow.parquet, pyarrow.feather
+            except: raise DatasetsError(
+                "The pyarrow module is required to write '%s'." % txt)
+            table = pyarrow.table([axis] + list(vals), names = [xlabel] + keys)
+            if ext == ".parquet": pyarrow.parquet.write_table(table, txt)
+            else: pyarrow.feather.write_feather(table, txt)
+            return
+
+        # Write a text file, formatting all the rows at once.
         length = len(format % 0)
         labels = " ".join([("%%%is" % length) % l for l in [xlabel] + keys])
-        txt.write("# " + labels[2:] + "\n")
-        for idx, xval in enumerate(self[keys[0]].axes[0]):
-            txt.write(" ".join(format % v for v in [xval] + [
-                        self[key].vals[idx] for key in keys]) + "\n")
-        txt.close()
+        row = " ".join([format]*(len(keys) + 1)) + "\n"
+        if numpy: flat = numpy.column_stack(
+            [numpy.asarray(axis, dtype = numpy.float64)] + [
+                numpy.asarray(val, dtype = numpy.float64) for val in vals]
+        ).ravel().tolist()
+        else: flat = [v for vs in zip(axis, *vals) for v in vs]
+        with open(txt, "w") as out:
+            out.write("# " + labels[2:] + "\n")
+            out.write((row*len(axis)) % tuple(flat))
 
     ###########################################################################
-    def plots(self, lower = "lower", upper = "upper", ymax = 1e5):
+    def __valid(self, lower, upper, ymax):
         """
-        Return the points, formatted for plots, for these 'Dataset's.
+        Return the x values, lower and upper y values, and the mask of
+        valid points, i.e. where the lower limit is below both 'ymax'
+        and the upper limit, for these 'Dataset's.
 
         lower: label used to access the lower limit.
         upper: label used to access the upper limit.
         ymax:  maximum y value to use.
         """
-        points = []
         lower, upper = self[lower], self.get(upper)
-        xs, yls, yus = [], [], []
-        for idx, x in enumerate(lower.axes[0]):
-            yl, yu = lower.vals[idx], upper.vals[idx] if upper else ymax
-            if abs(yl) < ymax and yl < yu:
-                xs += [x]; yls += [yl]; yus += [yu]
-            elif len(xs):
-                points += [[xs + [x for x in reversed(xs)],
-                            yls + [y for y in reversed(yus)]]]
-                xs, yls, yus = [], [], []
-        if len(xs):
-            points += [[xs + [x for x in reversed(xs)],
-                        yls + [y for y in reversed(yus)]]]
+        xs, yls = lower.axes[0], lower.vals
+        if numpy:
+            xs, yls = numpy.asarray(xs), numpy.asarray(yls)
+            yus = numpy.asarray(upper.vals) if upper else numpy.full(
+                len(yls), ymax, dtype = numpy.float64)
+            return xs, yls, yus, (abs(yls) < ymax) & (yls < yus)
+        yus = upper.vals if upper else [ymax]*len(yls)
+        return xs, yls, yus, [abs(yl) < ymax and yl < yu
+                              for yl, yu in zip(yls, yus)]
+
+    ###########################################################################
+    def plots(self, lower = "lower", upper = "upper", ymax = 1e5):
+        """
+        Return the points, formatted for plots, for these
+        'Dataset's. A polygon of x and y values is returned for each
+        contiguous range of valid points, following the lower limit
+        and then the upper limit in reverse. The polygons are arrays
+        if the NumPy module is available, and otherwise lists.
+
+        lower: label used to access the lower limit.
+        upper: label used to access the upper limit.
+        ymax:  maximum y value to use.
+        """
+        xs, yls, yus, valid = self.__valid(lower, upper, ymax)
+
+        # Find the contiguous ranges from the run-lengths of the mask.
+        if numpy:
+            edges = numpy.flatnonzero(numpy.diff(numpy.concatenate(
+                ([False], valid, [False])).astype(numpy.int8)))
+            return [[numpy.concatenate((xs[k0:k1], xs[k0:k1][::-1])),
+                     numpy.concatenate((yls[k0:k1], yus[k0:k1][::-1]))]
+                    for k0, k1 in zip(edges[0::2], edges[1::2])]
+        points, k0 = [], None
+        for k, ok in enumerate(list(valid) + [False]):
+            if ok and k0 == None: k0 = k
+            elif not ok and k0 != None:
+                points += [[list(xs[k0:k]) + list(reversed(xs[k0:k])),
+                            list(yls[k0:k]) + list(reversed(yus[k0:k]))]]
+                k0 = None
         return points
 
     ###########################################################################
     def ymin(self, lower = "lower", upper = "upper", xmin = -float("inf"),
-            xmax = float("inf")):
+            xmax = float("inf"), ymax = 1e5):
         """
         Return the global y minimum for these 'Dataset's in the form (x, y).
+        Only valid points are considered, see 'plots', and the minimum
+        is taken directly from the lower limit. If there are no such
+        points, (None, inf) is returned.
 
         lower: label used to access the lower limit.
         upper: label used to access the upper limit.
         xmin:  only consider y values with x values above this.
         xmax:  only consider y values with x values below this.
+        ymax:  maximum y value to use.
         """
-        points = self.plots(lower, upper)
+        xs, yls, yus, valid = self.__valid(lower, upper, ymax)
+        if numpy:
+            valid &= (xmin < xs) & (xs < xmax)
+            if not valid.any(): return None, float("inf")
+            idx = int(numpy.argmin(numpy.where(valid, yls, numpy.inf)))
+            return float(xs[idx]), float(yls[idx])
         xval, yval = None, float("inf")
-        for xs, ys in points:
-            lxs, lys = [], []
-            for x, y in zip(xs, ys):
-                if xmin < x < xmax: lxs += [x]; lys += [y]
-            if len(lxs):
-                ynow = min(lys)
-                if ynow < yval: xval, yval = lxs[lys.index(ynow)], ynow
+        for x, yl, ok in zip(xs, yls, valid):
+            if ok and xmin < x < xmax and yl < yval: xval, yval = x, yl
         return xval, yval
                 
 ###############################################################################